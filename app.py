@@ -7,8 +7,10 @@ from flask_login import LoginManager, UserMixin, login_user, logout_user, login_
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
 from functools import wraps
 import os
+import io
 import json
 import random
 import string
@@ -19,8 +21,10 @@ import logging
 
 # Import utility modules
 from utils.email_sender import send_email, send_acceptance_email, send_bulk_email
-from utils.pdf_generator import generate_application_pdf, generate_acceptance_letter, generate_invoice_pdf
+from utils.pdf_generator import (generate_application_pdf, generate_acceptance_letter_to_file,
+                                 generate_invoice_pdf, generate_invoice_pdf_to_file, warm_up as warm_up_pdf)
 from utils.excel_exporter import export_applications_to_excel, export_students_to_excel, export_payments_to_excel
+from database_setup import migrate_money_to_cents
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,9 +53,28 @@ os.makedirs('exports/excel', exist_ok=True)
 os.makedirs('exports/pdf', exist_ok=True)
 os.makedirs('static/documents', exist_ok=True)
 
+# Pay ReportLab's one-time setup at startup rather than on the first PDF request
+warm_up_pdf()
+
+# Rebuild money columns of databases created before they moved to integer cents
+with app.app_context():
+    _raw_conn = db.engine.raw_connection()
+    try:
+        migrate_money_to_cents(_raw_conn)
+    finally:
+        _raw_conn.close()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def to_cents(amount):
+    """Convert a currency amount to integer cents"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    """Convert integer cents to a 2-decimal-place Decimal"""
+    return Decimal(cents or 0).scaleb(-2)
+
 # ============== DATABASE MODELS ==============
 
 class Admin(UserMixin, db.Model):
@@ -145,7 +168,7 @@ class Course(db.Model):
     total_hours = db.Column(db.Integer, nullable=False)
     theory_hours = db.Column(db.Integer, default=0)
     practical_hours = db.Column(db.Integer, default=0)
-    fee = db.Column(db.Numeric(10, 2), nullable=False)
+    fee_cents = db.Column(db.Integer, nullable=False)
     requirements = db.Column(db.Text)
     branch_id = db.Column(db.Integer, db.ForeignKey('branches.id'))
     instructor_id = db.Column(db.Integer, db.ForeignKey('admins.id'))
@@ -163,6 +186,14 @@ class Course(db.Model):
     )
     students = db.relationship('Student', backref='student_course', foreign_keys='Student.course_id')
     lessons = db.relationship('Lesson', backref='course_lessons', foreign_keys='Lesson.course_id')
+    
+    @property
+    def fee(self):
+        return from_cents(self.fee_cents)
+    
+    @fee.setter
+    def fee(self, value):
+        self.fee_cents = to_cents(value)
 
 class Application(db.Model):
     __tablename__ = 'applications'
@@ -258,9 +289,9 @@ class Student(db.Model):
     progress_percentage = db.Column(db.Integer, default=0)
     last_assessment_score = db.Column(db.Integer)
     
-    # Financial Information
-    total_fee = db.Column(db.Numeric(10, 2), nullable=False)
-    amount_paid = db.Column(db.Numeric(10, 2), default=0)
+    # Financial Information (stored as integer cents)
+    total_fee_cents = db.Column(db.Integer, nullable=False)
+    amount_paid_cents = db.Column(db.Integer, default=0)
     payment_status = db.Column(db.String(20), default='pending')
     
     # Relationships
@@ -281,9 +312,25 @@ class Student(db.Model):
     payments = db.relationship('Payment', backref='student_payments', foreign_keys='Payment.student_id')
     lessons = db.relationship('Lesson', backref='student_lessons', foreign_keys='Lesson.student_id')
     
+    @property
+    def total_fee(self):
+        return from_cents(self.total_fee_cents)
+    
+    @total_fee.setter
+    def total_fee(self, value):
+        self.total_fee_cents = to_cents(value)
+    
+    @property
+    def amount_paid(self):
+        return from_cents(self.amount_paid_cents)
+    
+    @amount_paid.setter
+    def amount_paid(self, value):
+        self.amount_paid_cents = to_cents(value)
+    
     @property
     def balance(self):
-        return float(self.total_fee) - float(self.amount_paid)
+        return ((self.total_fee_cents or 0) - (self.amount_paid_cents or 0)) / 100
     
     @property
     def full_name(self):
@@ -366,7 +413,7 @@ class Payment(db.Model):
     # Payment Details
     payment_number = db.Column(db.String(50), unique=True, nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
-    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
     
     # Payment Method
     payment_method = db.Column(db.String(20), nullable=False)
@@ -394,6 +441,14 @@ class Payment(db.Model):
     receiver = db.relationship('Admin', backref='received_payments_rel', foreign_keys=[received_by])
     verifier = db.relationship('Admin', backref='verified_payments_rel', foreign_keys=[verified_by])
     
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+    
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+    
     @property
     def student_name(self):
         if self.student and self.student.application:
@@ -565,9 +620,10 @@ def generate_application_number():
     
     return f"APP-{year}-{month:02d}-{count + 1:04d}"
 
-def generate_student_number(application_id):
+def generate_student_number(application_id, today=None):
     """Generate unique student number"""
-    today = datetime.now(timezone.utc)
+    if today is None:
+        today = datetime.now(timezone.utc)
     return f"STU-{today.strftime('%Y%m')}{application_id:04d}"
 
 def generate_payment_number(student_id):
@@ -1125,24 +1181,27 @@ def update_application():
         notes = request.form.get('notes', '')
         
         if action == 'accept':
+            now = datetime.utcnow()
+            today = now.date()
+            
             application.status = 'accepted'
             application.reviewed_by = current_user.id
-            application.reviewed_at = datetime.utcnow()
+            application.reviewed_at = now
             application.admin_notes = notes
             
             # Create student record
-            student_number = generate_student_number(application.id)
+            student_number = generate_student_number(application.id, now)
             course = Course.query.get(application.course_id)
             
             student = Student(
                 student_number=student_number,
                 application_id=application.id,
-                enrollment_date=datetime.utcnow().date(),
-                course_start_date=datetime.utcnow().date() + timedelta(days=7),  # Start in 1 week
-                course_end_date=datetime.utcnow().date() + timedelta(weeks=course.duration_weeks),
+                enrollment_date=today,
+                course_start_date=today + timedelta(days=7),  # Start in 1 week
+                course_end_date=today + timedelta(weeks=course.duration_weeks),
                 course_id=application.course_id,
                 branch_id=application.branch_id,
-                total_fee=course.fee,
+                total_fee_cents=course.fee_cents,
                 assigned_instructor=course.instructor_id,
                 created_by=current_user.id
             )
@@ -1150,7 +1209,7 @@ def update_application():
             db.session.add(student)
             
             # Send acceptance email
-            pdf_path = generate_acceptance_letter(application)
+            pdf_path = generate_acceptance_letter_to_file(application)
             application_data = {
                 'id': application.id,
                 'first_name': application.first_name,
@@ -1321,11 +1380,13 @@ def add_payment():
         # Generate payment number
         payment_number = generate_payment_number(student_id)
         
+        amount_cents = to_cents(amount)
+        
         # Create payment
         payment = Payment(
             payment_number=payment_number,
             student_id=student_id,
-            amount=amount,
+            amount_cents=amount_cents,
             payment_method=payment_method,
             payment_date=payment_date,
             received_by=current_user.id,
@@ -1335,18 +1396,18 @@ def add_payment():
         )
         
         # Update student's payment status
-        student.amount_paid = student.amount_paid + amount
+        student.amount_paid_cents = (student.amount_paid_cents or 0) + amount_cents
         
-        if student.amount_paid >= student.total_fee:
+        if student.amount_paid_cents >= student.total_fee_cents:
             student.payment_status = 'paid'
-        elif student.amount_paid > 0:
+        elif student.amount_paid_cents > 0:
             student.payment_status = 'partial'
         
         db.session.add(payment)
         db.session.commit()
         
         # Generate invoice PDF
-        pdf_path = generate_invoice_pdf(payment)
+        pdf_path = generate_invoice_pdf_to_file(payment)
         
         # Send email notification
         if student.application:
@@ -1382,6 +1443,20 @@ def add_payment():
 
 # ============== EXPORT ROUTES ==============
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def send_excel(export_func, rows, name):
+    """Render an Excel export in memory and send it as a download"""
+    output = io.BytesIO()
+    export_func(rows, output)
+    output.seek(0)
+    download_name = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return send_file(output, as_attachment=True, download_name=download_name, mimetype=XLSX_MIMETYPE)
+
+def send_pdf(pdf, download_name):
+    """Send PDF bytes rendered in memory as a download"""
+    return send_file(io.BytesIO(pdf), as_attachment=True, download_name=download_name, mimetype='application/pdf')
+
 @app.route('/admin/export/applications/excel')
 @admin_required
 def export_applications_excel():
@@ -1389,11 +1464,11 @@ def export_applications_excel():
     applications = Application.query.options(
         joinedload(Application.course),
         joinedload(Application.branch)
-    ).all()
+    ).yield_per(1000)
     
-    applications_data = []
-    for app in applications:
-        applications_data.append({
+    # Rows are built lazily as the exporter consumes them
+    applications_data = (
+        {
             'id': app.id,
             'application_number': app.application_number,
             'first_name': app.first_name,
@@ -1412,10 +1487,11 @@ def export_applications_excel():
             'application_date': app.application_date,
             'created_at': app.created_at,
             'admin_notes': app.admin_notes
-        })
+        }
+        for app in applications
+    )
     
-    excel_path = export_applications_to_excel(applications_data)
-    return send_file(excel_path, as_attachment=True)
+    return send_excel(export_applications_to_excel, applications_data, 'applications')
 
 @app.route('/admin/export/students/excel')
 @admin_required
@@ -1425,11 +1501,11 @@ def export_students_excel():
         joinedload(Student.application),
         joinedload(Student.course),
         joinedload(Student.branch)
-    ).all()
+    ).yield_per(1000)
     
-    students_data = []
-    for student in students:
-        students_data.append({
+    # Rows are built lazily as the exporter consumes them
+    students_data = (
+        {
             'id': student.id,
             'student_number': student.student_number,
             'first_name': student.application.first_name if student.application else '',
@@ -1447,10 +1523,11 @@ def export_students_excel():
             'amount_paid': float(student.amount_paid) if student.amount_paid else 0,
             'balance': student.balance,
             'progress_percentage': student.progress_percentage
-        })
+        }
+        for student in students
+    )
     
-    excel_path = export_students_to_excel(students_data)
-    return send_file(excel_path, as_attachment=True)
+    return send_excel(export_students_to_excel, students_data, 'students')
 
 @app.route('/admin/export/payments/excel')
 @admin_required
@@ -1459,11 +1536,11 @@ def export_payments_excel():
     payments = Payment.query.options(
         joinedload(Payment.student).joinedload(Student.application),
         joinedload(Payment.receiver)
-    ).all()
+    ).yield_per(1000)
     
-    payments_data = []
-    for payment in payments:
-        payments_data.append({
+    # Rows are built lazily as the exporter consumes them
+    payments_data = (
+        {
             'id': payment.id,
             'payment_number': payment.payment_number,
             'student_number': payment.student.student_number if payment.student else '',
@@ -1474,38 +1551,46 @@ def export_payments_excel():
             'status': payment.status,
             'received_by': payment.receiver.name if payment.receiver else '',
             'notes': payment.notes
-        })
+        }
+        for payment in payments
+    )
     
-    excel_path = export_payments_to_excel(payments_data)
-    return send_file(excel_path, as_attachment=True)
+    return send_excel(export_payments_to_excel, payments_data, 'payments')
 
 @app.route('/admin/export/application/<int:application_id>/pdf')
 @admin_required
 def export_application_pdf(application_id):
     """Export single application as PDF"""
-    application = Application.query.get_or_404(application_id)
+    application = Application.query.options(
+        joinedload(Application.course),
+        joinedload(Application.branch)
+    ).get_or_404(application_id)
     
     # Check permission
     if not current_user.can_access_branch(application.branch_id):
         flash('You do not have permission to export this application.', 'error')
         return redirect(url_for('admin_applications'))
     
-    pdf_path = generate_application_pdf(application)
-    return send_file(pdf_path, as_attachment=True, download_name=f"application_{application.application_number}.pdf")
+    pdf = generate_application_pdf(application)
+    return send_pdf(pdf, f"application_{application.application_number}.pdf")
 
 @app.route('/admin/export/invoice/<int:payment_id>/pdf')
 @admin_required
 def export_invoice_pdf(payment_id):
     """Export invoice as PDF"""
-    payment = Payment.query.get_or_404(payment_id)
+    payment = Payment.query.options(
+        joinedload(Payment.student).joinedload(Student.application),
+        joinedload(Payment.student).joinedload(Student.course),
+        joinedload(Payment.receiver)
+    ).get_or_404(payment_id)
     
     # Check permission
     if payment.student and not current_user.can_access_branch(payment.student.branch_id):
         flash('You do not have permission to export this invoice.', 'error')
         return redirect(url_for('admin_payments'))
     
-    pdf_path = generate_invoice_pdf(payment)
-    return send_file(pdf_path, as_attachment=True, download_name=f"invoice_{payment.payment_number}.pdf")
+    pdf = generate_invoice_pdf(payment)
+    return send_pdf(pdf, f"invoice_{payment.payment_number}.pdf")
 
 # ============== API ENDPOINTS ==============
 
@@ -1555,7 +1640,7 @@ def api_statistics():
         },
         'payments': {
             'total': len(payments),
-            'total_amount': sum(float(p.amount) for p in payments),
+            'total_amount': sum(p.amount_cents for p in payments) / 100,
             'completed': len([p for p in payments if p.status == 'completed'])
         }
     }
@@ -2469,7 +2554,7 @@ def init_database():
                     total_hours=40,
                     theory_hours=10,
                     practical_hours=30,
-                    fee=1500.00,
+                    fee_cents=150000,
                     requirements='Minimum age: 16 years\nValid NRC\nMedical Certificate',
                     branch_id=branch.id,
                     instructor_id=super_admin.id,
@@ -2484,7 +2569,7 @@ def init_database():
                     total_hours=60,
                     theory_hours=20,
                     practical_hours=40,
-                    fee=2500.00,
+                    fee_cents=250000,
                     requirements='Minimum age: 18 years\nValid NRC\nMedical Certificate',
                     branch_id=branch.id,
                     instructor_id=super_admin.id,
@@ -2492,7 +2577,7 @@ def init_database():
                 )
             ]
             
-            db.session.add_all(courses)
+            db.session.bulk_save_objects(courses, return_defaults=False)
             db.session.commit()
             print("✅ Sample courses created")
 
@@ -3,39 +3,42 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Snapshot the environment once; Config reads from this dict
+_E = os.environ.copy()
+
 class Config:
     # Flask
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('DEBUG', 'False') == 'True'
+    SECRET_KEY = _E.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    DEBUG = _E.get('DEBUG', 'False') == 'True'
     
     # Database
-    MYSQL_HOST = os.getenv('DB_HOST', 'localhost')
-    MYSQL_USER = os.getenv('DB_USER', 'root')
-    MYSQL_PASSWORD = os.getenv('DB_PASSWORD', '')
-    MYSQL_DB = os.getenv('DB_NAME', 'keem_driving_school')
+    MYSQL_HOST = _E.get('DB_HOST', 'localhost')
+    MYSQL_USER = _E.get('DB_USER', 'root')
+    MYSQL_PASSWORD = _E.get('DB_PASSWORD', '')
+    MYSQL_DB = _E.get('DB_NAME', 'keem_driving_school')
     MYSQL_CURSORCLASS = 'DictCursor'
     
     # Upload
     UPLOAD_FOLDER = 'static/uploads'
-    MAX_CONTENT_LENGTH = int(os.getenv('MAX_FILE_SIZE', 16 * 1024 * 1024))
-    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'pdf,jpg,jpeg,png').split(','))
+    MAX_CONTENT_LENGTH = int(_E.get('MAX_FILE_SIZE', 16 * 1024 * 1024))
+    ALLOWED_EXTENSIONS = set(_E.get('ALLOWED_EXTENSIONS', 'pdf,jpg,jpeg,png').split(','))
     
     # Email
-    SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-    SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
-    SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
-    SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
-    FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@keemdrivingschool.com')
-    FROM_NAME = os.getenv('FROM_NAME', 'KEEM Driving School')
+    SMTP_SERVER = _E.get('SMTP_SERVER', 'smtp.gmail.com')
+    SMTP_PORT = int(_E.get('SMTP_PORT', 587))
+    SMTP_USERNAME = _E.get('SMTP_USERNAME', '')
+    SMTP_PASSWORD = _E.get('SMTP_PASSWORD', '')
+    FROM_EMAIL = _E.get('FROM_EMAIL', 'noreply@keemdrivingschool.com')
+    FROM_NAME = _E.get('FROM_NAME', 'KEEM Driving School')
     
     # WhatsApp (Twilio)
-    TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
-    TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
-    TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER', '')
+    TWILIO_ACCOUNT_SID = _E.get('TWILIO_ACCOUNT_SID', '')
+    TWILIO_AUTH_TOKEN = _E.get('TWILIO_AUTH_TOKEN', '')
+    TWILIO_WHATSAPP_NUMBER = _E.get('TWILIO_WHATSAPP_NUMBER', '')
     
     # Admin
-    ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'admin@keemdrivingschool.com')
-    ADMIN_WHATSAPP = os.getenv('ADMIN_WHATSAPP', '+260XXXXXXXXX')
+    ADMIN_EMAIL = _E.get('ADMIN_EMAIL', 'admin@keemdrivingschool.com')
+    ADMIN_WHATSAPP = _E.get('ADMIN_WHATSAPP', '+260XXXXXXXXX')
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -2,17 +2,153 @@
 SQLite Database Setup for KEEM Driving School with Proper Relationships
 """
 import sqlite3
-from datetime import datetime
+import json
+import re
+import zlib
 from werkzeug.security import generate_password_hash
 
+# ============== DEFAULT DATA ==============
+
+_DEFAULT_BRANCHES = [
+    ('Luanshya Branch', 'LUAN-001', 'Plot 123, Main Street, Luanshya', 'Luanshya', '+260 123 456 789', 'luanshya@keemdrivingschool.com', 1),
+    ('Mufulira Branch', 'MUFU-001', 'Plot 456, Independence Avenue, Mufulira', 'Mufulira', '+260 987 654 321', 'mufulira@keemdrivingschool.com', 1)
+]
+
+_DEFAULT_COURSES = [
+    ('Class A - Motorcycle License', 'CLASS-A', 'Complete motorcycle driving course including theory and practical training', 
+     'Motorcycle', 4, 40, 10, 30, 150000, 'Minimum age: 16 years\nValid NRC\nMedical Certificate', 1, 1, 1),
+    ('Class B - Light Vehicle License', 'CLASS-B', 'Comprehensive car driving course for light vehicles', 
+     'Light Vehicle', 6, 60, 20, 40, 250000, 'Minimum age: 18 years\nValid NRC\nMedical Certificate', 1, 1, 1),
+    ('Class C - Heavy Vehicle License', 'CLASS-C', 'Heavy vehicle and truck driving course', 
+     'Heavy Vehicle', 8, 80, 25, 55, 350000, 'Minimum age: 21 years\nValid NRC\nMedical Certificate\nClass B License', 2, 1, 1),
+    ('Class D - PSV License', 'CLASS-D', 'Public Service Vehicle driving course', 
+     'PSV', 6, 65, 20, 45, 300000, 'Minimum age: 21 years\nValid NRC\nMedical Certificate\nClass B License', 2, 1, 1),
+    ('Refresher Course', 'REFRESH', 'Refresher course for experienced drivers', 
+     'Special', 2, 20, 5, 15, 80000, 'Valid Driver\'s License', 1, 1, 1),
+    ('Defensive Driving', 'DEFENSIVE', 'Advanced defensive driving techniques', 
+     'Special', 3, 30, 10, 20, 120000, 'Valid Driver\'s License', 1, 1, 1)
+]
+
+_DEFAULT_SETTINGS = [
+    ('school_name', 'KEEM Driving School', 'string', 'general', 'School name'),
+    ('school_email', 'info@keemdrivingschool.com', 'string', 'general', 'Primary school email'),
+    ('school_phone', '+260 123 456 789', 'string', 'general', 'Primary contact number'),
+    ('whatsapp_number', '+260 987 654 321', 'string', 'general', 'WhatsApp business number'),
+    ('notification_email', 'notifications@keemdrivingschool.com', 'string', 'notifications', 'Email for notifications'),
+    ('currency', 'ZMW', 'string', 'financial', 'Default currency'),
+    ('tax_rate', '16', 'string', 'financial', 'Tax rate percentage'),
+    ('application_fee', '50', 'string', 'financial', 'Non-refundable application fee'),
+    ('max_students_per_class', '15', 'integer', 'academic', 'Maximum students per class'),
+    ('lesson_duration', '60', 'integer', 'academic', 'Default lesson duration in minutes'),
+    ('auto_accept_applications', 'false', 'boolean', 'applications', 'Automatically accept applications'),
+    ('allow_online_payments', 'true', 'boolean', 'financial', 'Allow online payments'),
+    ('maintenance_mode', 'false', 'boolean', 'system', 'Maintenance mode status')
+]
+
+def pack_audit_values(values):
+    """Serialize a row dict for audit_logs.old_values/new_values as compressed JSON"""
+    if values is None:
+        return None
+    return zlib.compress(json.dumps(values, default=str).encode('utf-8'), 6)
+
+def unpack_audit_values(blob):
+    """Inverse of pack_audit_values"""
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+# DECIMAL currency columns that are now stored as integer cents in <name>_cents
+_MONEY_COLUMNS = {
+    'courses': ('fee',),
+    'students': ('total_fee', 'amount_paid'),
+    'payments': ('amount',),
+    'payment_installments': ('amount',),
+}
+
+def migrate_money_to_cents(conn):
+    """
+    Convert an existing database's DECIMAL money columns to *_cents
+
+    SQLite can't rename and retype a column in place and the old columns
+    are NOT NULL, so each affected table is rebuilt from its stored CREATE
+    statement with the column swapped for "<name>_cents INTEGER", the rows
+    are copied across as CAST(ROUND(<name> * 100) AS INTEGER), and the
+    table's indexes and triggers are recreated. Tables that are missing or
+    already migrated are skipped, so this is safe to run on every start.
+    Returns the names of the tables that were rebuilt.
+    """
+    conn.commit()  # the rebuilds manage their own transactions
+    cursor = conn.cursor()
+    migrated = []
+    foreign_keys = cursor.execute('PRAGMA foreign_keys').fetchone()[0]
+    # Must be off while the old tables are dropped; it has no effect inside a transaction
+    cursor.execute('PRAGMA foreign_keys = OFF')
+    try:
+        for table, money_columns in _MONEY_COLUMNS.items():
+            # Take the write lock before looking, so two processes starting
+            # together can't both decide to rebuild the same table
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+                old_columns = [column for column in money_columns if column in columns]
+                if not old_columns:
+                    cursor.execute('COMMIT')
+                    continue
+
+                create_sql = cursor.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()[0]
+                extra_sql = [row[0] for row in cursor.execute(
+                    "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                    "AND tbl_name = ? AND sql IS NOT NULL", (table,)
+                )]
+
+                new_sql = re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?\w+"?',
+                                 f'CREATE TABLE {table}_migrating', create_sql, count=1)
+                for column in old_columns:
+                    new_sql = re.sub(rf'\b{column}\s+(DECIMAL|NUMERIC)\s*\(\s*10\s*,\s*2\s*\)',
+                                     f'{column}_cents INTEGER', new_sql, count=1)
+
+                targets = [f'{c}_cents' if c in old_columns else c for c in columns]
+                sources = [f'CAST(ROUND({c} * 100) AS INTEGER)' if c in old_columns else c for c in columns]
+
+                cursor.execute(new_sql)
+                cursor.execute(f'INSERT INTO {table}_migrating ({", ".join(targets)}) '
+                               f'SELECT {", ".join(sources)} FROM {table}')
+                cursor.execute(f'DROP TABLE {table}')
+                cursor.execute(f'ALTER TABLE {table}_migrating RENAME TO {table}')
+                for sql in extra_sql:
+                    cursor.execute(sql)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            migrated.append(table)
+    finally:
+        cursor.execute(f'PRAGMA foreign_keys = {int(foreign_keys)}')
+
+    if migrated:
+        print(f"✅ Money columns migrated to cents: {', '.join(migrated)}")
+    return migrated
+
 def create_database():
     """Create SQLite database with all tables and proper relationships"""
     conn = sqlite3.connect('keem_driving.db')
     cursor = conn.cursor()
-    
+
+    # Use 8 KiB pages for the wide application rows. An existing file keeps its
+    # old page size until it is rebuilt, so only VACUUM when the size differs.
+    cursor.execute('PRAGMA page_size = 8192')
+    if cursor.execute('PRAGMA page_size').fetchone()[0] != 8192:
+        cursor.execute('VACUUM')
+
     # Enable foreign keys
     cursor.execute('PRAGMA foreign_keys = ON')
-    
+
+    # Databases created before money moved to integer cents still have the
+    # DECIMAL columns, which CREATE TABLE IF NOT EXISTS below would keep
+    migrate_money_to_cents(conn)
+
     # ============== CORE TABLES ==============
     
     # Admins Table
@@ -27,7 +163,7 @@ def create_database():
         role TEXT CHECK(role IN ('super_admin', 'admin', 'instructor', 'staff')) DEFAULT 'admin',
         branch TEXT CHECK(branch IN ('Luanshya', 'Mufulira', 'Both')) DEFAULT 'Luanshya',
         specialization TEXT,
-        is_active BOOLEAN DEFAULT 1,
+        is_active INTEGER DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         last_login TIMESTAMP
@@ -45,7 +181,7 @@ def create_database():
         phone TEXT,
         email TEXT,
         manager_id INTEGER,
-        is_active BOOLEAN DEFAULT 1,
+        is_active INTEGER DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (manager_id) REFERENCES admins(id) ON DELETE SET NULL
     )
@@ -63,11 +199,11 @@ def create_database():
         total_hours INTEGER NOT NULL,
         theory_hours INTEGER DEFAULT 0,
         practical_hours INTEGER DEFAULT 0,
-        fee DECIMAL(10, 2) NOT NULL,
+        fee_cents INTEGER NOT NULL,
         requirements TEXT,
         branch_id INTEGER,
         instructor_id INTEGER,
-        is_active BOOLEAN DEFAULT 1,
+        is_active INTEGER DEFAULT 1,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (branch_id) REFERENCES branches(id) ON DELETE SET NULL,
@@ -156,9 +292,9 @@ def create_database():
         progress_percentage INTEGER DEFAULT 0,
         last_assessment_score INTEGER,
         
-        -- Financial Information
-        total_fee DECIMAL(10, 2) NOT NULL,
-        amount_paid DECIMAL(10, 2) DEFAULT 0,
+        -- Financial Information (amounts stored as integer cents)
+        total_fee_cents INTEGER NOT NULL,
+        amount_paid_cents INTEGER DEFAULT 0,
         payment_status TEXT CHECK(payment_status IN ('pending', 'partial', 'paid', 'overdue')) DEFAULT 'pending',
         
         -- Relationships
@@ -225,10 +361,7 @@ def create_database():
         -- Foreign Keys
         FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE,
         FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-        FOREIGN KEY (instructor_id) REFERENCES admins(id) ON DELETE RESTRICT,
-        
-        -- Constraints
-        UNIQUE(student_id, scheduled_date, scheduled_time)
+        FOREIGN KEY (instructor_id) REFERENCES admins(id) ON DELETE RESTRICT
     )
     ''')
     
@@ -242,7 +375,7 @@ def create_database():
         -- Payment Details
         payment_number TEXT UNIQUE NOT NULL,
         student_id INTEGER NOT NULL,
-        amount DECIMAL(10, 2) NOT NULL,
+        amount_cents INTEGER NOT NULL,
         
         -- Payment Method
         payment_method TEXT CHECK(payment_method IN ('cash', 'mobile_money', 'bank_transfer', 'card', 'check')) NOT NULL,
@@ -279,7 +412,7 @@ def create_database():
         payment_plan_id INTEGER NOT NULL,
         installment_number INTEGER NOT NULL,
         due_date DATE NOT NULL,
-        amount DECIMAL(10, 2) NOT NULL,
+        amount_cents INTEGER NOT NULL,
         status TEXT CHECK(status IN ('pending', 'paid', 'overdue', 'cancelled')) DEFAULT 'pending',
         payment_id INTEGER,
         notes TEXT,
@@ -338,7 +471,7 @@ def create_database():
         notification_type TEXT CHECK(notification_type IN ('application', 'payment', 'lesson', 'system', 'alert')) NOT NULL,
         
         -- Status
-        is_read BOOLEAN DEFAULT 0,
+        is_read INTEGER DEFAULT 0,
         
         -- Metadata
         related_id INTEGER,
@@ -368,7 +501,7 @@ def create_database():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         last_login TIMESTAMP,
         login_count INTEGER DEFAULT 0,
-        is_active BOOLEAN DEFAULT 1,
+        is_active INTEGER DEFAULT 1,
         FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
     )
     ''')
@@ -388,7 +521,7 @@ def create_database():
         setting_type TEXT CHECK(setting_type IN ('string', 'integer', 'boolean', 'json')) DEFAULT 'string',
         category TEXT DEFAULT 'general',
         description TEXT,
-        is_public BOOLEAN DEFAULT 0,
+        is_public INTEGER DEFAULT 0,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
@@ -409,15 +542,26 @@ def create_database():
         table_name TEXT NOT NULL,
         record_id INTEGER,
         
-        -- Changes
-        old_values TEXT,
-        new_values TEXT,
+        -- Changes (zlib-compressed JSON, see pack_audit_values)
+        old_values BLOB,
+        new_values BLOB,
         
         -- Timestamps
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
     
+    # Keep only the most recent 100,000 audit entries. Ids are monotonic
+    # (AUTOINCREMENT), so trimming in blocks of 1,000 is a rowid range delete.
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS audit_logs_cap
+    AFTER INSERT ON audit_logs
+    WHEN NEW.id % 1000 = 0
+    BEGIN
+        DELETE FROM audit_logs WHERE id <= NEW.id - 100000;
+    END
+    ''')
+    
     # ============== INSERT DEFAULT DATA ==============
     
     # Insert Default Super Admin
@@ -435,60 +579,23 @@ def create_database():
     ))
     
     # Insert Branches
-    branches = [
-        ('Luanshya Branch', 'LUAN-001', 'Plot 123, Main Street, Luanshya', 'Luanshya', '+260 123 456 789', 'luanshya@keemdrivingschool.com', 1),
-        ('Mufulira Branch', 'MUFU-001', 'Plot 456, Independence Avenue, Mufulira', 'Mufulira', '+260 987 654 321', 'mufulira@keemdrivingschool.com', 1)
-    ]
-    
     cursor.executemany('''
     INSERT OR IGNORE INTO branches (name, code, address, city, phone, email, manager_id)
     VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', branches)
+    ''', _DEFAULT_BRANCHES)
     
     # Insert Courses with proper relationships
-    courses = [
-        ('Class A - Motorcycle License', 'CLASS-A', 'Complete motorcycle driving course including theory and practical training', 
-         'Motorcycle', 4, 40, 10, 30, 1500.00, 'Minimum age: 16 years\nValid NRC\nMedical Certificate', 1, 1),
-        ('Class B - Light Vehicle License', 'CLASS-B', 'Comprehensive car driving course for light vehicles', 
-         'Light Vehicle', 6, 60, 20, 40, 2500.00, 'Minimum age: 18 years\nValid NRC\nMedical Certificate', 1, 1),
-        ('Class C - Heavy Vehicle License', 'CLASS-C', 'Heavy vehicle and truck driving course', 
-         'Heavy Vehicle', 8, 80, 25, 55, 3500.00, 'Minimum age: 21 years\nValid NRC\nMedical Certificate\nClass B License', 2, 1),
-        ('Class D - PSV License', 'CLASS-D', 'Public Service Vehicle driving course', 
-         'PSV', 6, 65, 20, 45, 3000.00, 'Minimum age: 21 years\nValid NRC\nMedical Certificate\nClass B License', 2, 1),
-        ('Refresher Course', 'REFRESH', 'Refresher course for experienced drivers', 
-         'Special', 2, 20, 5, 15, 800.00, 'Valid Driver\'s License', 1, 1),
-        ('Defensive Driving', 'DEFENSIVE', 'Advanced defensive driving techniques', 
-         'Special', 3, 30, 10, 20, 1200.00, 'Valid Driver\'s License', 1, 1)
-    ]
-    
     cursor.executemany('''
     INSERT OR IGNORE INTO courses 
-    (name, code, description, category, duration_weeks, total_hours, theory_hours, practical_hours, fee, requirements, branch_id, instructor_id, is_active)
+    (name, code, description, category, duration_weeks, total_hours, theory_hours, practical_hours, fee_cents, requirements, branch_id, instructor_id, is_active)
     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', [(name, code, desc, cat, dur, th, theory, practical, fee, req, branch, instr, 1) 
-          for name, code, desc, cat, dur, th, theory, practical, fee, req, branch, instr in courses])
+    ''', _DEFAULT_COURSES)
     
     # Insert System Settings
-    settings = [
-        ('school_name', 'KEEM Driving School', 'string', 'general', 'School name'),
-        ('school_email', 'info@keemdrivingschool.com', 'string', 'general', 'Primary school email'),
-        ('school_phone', '+260 123 456 789', 'string', 'general', 'Primary contact number'),
-        ('whatsapp_number', '+260 987 654 321', 'string', 'general', 'WhatsApp business number'),
-        ('notification_email', 'notifications@keemdrivingschool.com', 'string', 'notifications', 'Email for notifications'),
-        ('currency', 'ZMW', 'string', 'financial', 'Default currency'),
-        ('tax_rate', '16', 'string', 'financial', 'Tax rate percentage'),
-        ('application_fee', '50', 'string', 'financial', 'Non-refundable application fee'),
-        ('max_students_per_class', '15', 'integer', 'academic', 'Maximum students per class'),
-        ('lesson_duration', '60', 'integer', 'academic', 'Default lesson duration in minutes'),
-        ('auto_accept_applications', 'false', 'boolean', 'applications', 'Automatically accept applications'),
-        ('allow_online_payments', 'true', 'boolean', 'financial', 'Allow online payments'),
-        ('maintenance_mode', 'false', 'boolean', 'system', 'Maintenance mode status')
-    ]
-    
     cursor.executemany('''
     INSERT OR IGNORE INTO settings (setting_key, setting_value, setting_type, category, description)
     VALUES (?, ?, ?, ?, ?)
-    ''', settings)
+    ''', _DEFAULT_SETTINGS)
     
     conn.commit()
     
@@ -509,9 +616,19 @@ def create_database():
         'CREATE INDEX IF NOT EXISTS idx_contact_messages_status ON contact_messages(status)',
         'CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id)',
         'CREATE INDEX IF NOT EXISTS idx_notifications_is_read ON notifications(is_read)',
+        'CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_logs(created_at)',
 
         'CREATE INDEX IF NOT EXISTS idx_student_access_code ON student_portal_access(access_code)',
         'CREATE INDEX IF NOT EXISTS idx_student_access_email ON student_portal_access(email)',
+
+        # Composite indexes for combined filters (leading columns filter, trailing columns order)
+        'CREATE INDEX IF NOT EXISTS idx_applications_branch_status ON applications(branch_id, status, created_at DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_students_course_status ON students(course_id, status)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_student_date ON payments(student_id, payment_date DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_lessons_student_sched ON lessons(student_id, scheduled_date)',
+
+        # One active lesson per student slot; completed/cancelled lessons are not indexed
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_lessons_active_slot ON lessons(student_id, scheduled_date, scheduled_time) WHERE status IN ('scheduled', 'rescheduled')",
     ]
     
     for index_sql in indexes:
@@ -553,24 +670,16 @@ def seed_sample_data():
     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', sample_applications)
     
-    # Get the inserted application IDs
-    cursor.execute('SELECT id, application_number FROM applications WHERE application_number IN ("APP-2024-0001", "APP-2024-0002")')
-    apps = cursor.fetchall()
-    
-    # Insert sample students for accepted applications
-    if apps:
-        for app_id, app_number in apps:
-            if '0001' in app_number:  # Only create student for accepted application
-                student_number = f"STU-{datetime.now().strftime('%Y%m')}{app_id:04d}"
-                cursor.execute('''
-                INSERT OR IGNORE INTO students 
-                (student_number, application_id, enrollment_date, course_start_date, course_end_date,
-                 status, total_fee, amount_paid, payment_status, course_id, branch_id, assigned_instructor, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    student_number, app_id, '2024-01-20', '2024-02-01', '2024-03-01',
-                    'active', 2500.00, 500.00, 'partial', 1, 1, 1, 1
-                ))
+    # Insert sample student for the accepted application
+    cursor.execute('''
+    INSERT OR IGNORE INTO students 
+    (student_number, application_id, enrollment_date, course_start_date, course_end_date,
+     status, total_fee_cents, amount_paid_cents, payment_status, course_id, branch_id, assigned_instructor, created_by)
+    SELECT 'STU-' || strftime('%Y%m', 'now', 'localtime') || printf('%04d', id), id, '2024-01-20', '2024-02-01', '2024-03-01',
+           'active', 250000, 50000, 'partial', 1, 1, 1, 1
+    FROM applications
+    WHERE application_number = 'APP-2024-0001'
+    ''')
     
     conn.commit()
     conn.close()
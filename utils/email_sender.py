@@ -7,82 +7,43 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
+from jinja2 import Template
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import copy
+import io
+import queue
+import ssl
+import time
 import os
 
+try:
+    import aiosmtplib
+except ImportError:  # only needed by send_bulk_email_async
+    aiosmtplib = None
+
 # Email Configuration - Update these with your actual settings
 SMTP_SERVER = 'smtp.gmail.com'  # or your hosting SMTP
-SMTP_PORT = 587
+SMTP_PORT = 587  # STARTTLS port, used when SMTP_USE_SSL is False
+SMTP_SSL_PORT = 465
+SMTP_USE_SSL = True  # TLS on connect; set False for providers that only offer STARTTLS
 SMTP_USERNAME = 'your-email@gmail.com'
 SMTP_PASSWORD = 'your-app-password'
 FROM_EMAIL = 'noreply@keemdrivingschool.com'
 FROM_NAME = 'KEEM Driving School'
 
-def send_email(to_email, subject, body, attachments=None, html=False):
-    """
-    Send email with optional attachments
-    
-    Args:
-        to_email: Recipient email address
-        subject: Email subject
-        body: Email body content
-        attachments: List of file paths to attach
-        html: Boolean, if True body is treated as HTML
-    """
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = f'{FROM_NAME} <{FROM_EMAIL}>'
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        if html:
-            msg.attach(MIMEText(body, 'html'))
-        else:
-            msg.attach(MIMEText(body, 'plain'))
-        
-        # Add attachments if any
-        if attachments:
-            for file_path in attachments:
-                if os.path.exists(file_path):
-                    with open(file_path, 'rb') as attachment:
-                        part = MIMEBase('application', 'octet-stream')
-                        part.set_payload(attachment.read())
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename={os.path.basename(file_path)}'
-                        )
-                        msg.attach(part)
-        
-        # Send email
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        
-        print(f"Email sent successfully to {to_email}")
-        return True
-        
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
-
-def send_acceptance_email(to_email, subject, application_data, pdf_path=None):
-    """
-    Send acceptance email with acceptance letter
-    """
-    html_body = f"""
+ACCEPTANCE_EMAIL_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
         <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #dc2626 0%, #000000 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .button {{ display: inline-block; padding: 12px 30px; background: #dc2626; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-            .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 12px; }}
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background: linear-gradient(135deg, #dc2626 0%, #000000 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+            .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+            .button { display: inline-block; padding: 12px 30px; background: #dc2626; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }
+            .footer { text-align: center; margin-top: 30px; color: #666; font-size: 12px; }
         </style>
     </head>
     <body>
@@ -92,15 +53,15 @@ def send_acceptance_email(to_email, subject, application_data, pdf_path=None):
                 <p>Your Application Has Been Accepted</p>
             </div>
             <div class="content">
-                <h2>Dear {application_data['first_name']} {application_data['last_name']},</h2>
+                <h2>Dear {{ app.first_name }} {{ app.last_name }},</h2>
                 
                 <p>We are thrilled to inform you that your application to <strong>KEEM Driving School</strong> has been <strong>ACCEPTED</strong>!</p>
                 
                 <p><strong>Application Details:</strong></p>
                 <ul>
-                    <li>Application ID: {application_data['id']}</li>
-                    <li>Course: {application_data['course_type']}</li>
-                    <li>Branch: {application_data['branch']}</li>
+                    <li>Application ID: {{ app.id }}</li>
+                    <li>Course: {{ app.course_type }}</li>
+                    <li>Branch: {{ app.branch }}</li>
                 </ul>
                 
                 <p><strong>Next Steps:</strong></p>
@@ -130,7 +91,218 @@ def send_acceptance_email(to_email, subject, application_data, pdf_path=None):
         </div>
     </body>
     </html>
+"""
+
+# Compiled once at import; autoescape protects the applicant-supplied fields
+_ACCEPTANCE_TEMPLATE = Template(ACCEPTANCE_EMAIL_HTML, autoescape=True)
+
+# Built once so each connection doesn't reload the CA bundle
+_SSL_CTX = ssl.create_default_context()
+
+# Read size for attachments: a multiple of 57 bytes encodes to whole 76-char base64 lines
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+# Attachments up to this size are read with a single read() call
+ATTACHMENT_STREAM_THRESHOLD = 2 * 1024 * 1024
+
+def _attachment_part(file_path):
+    """
+    Build a base64 attachment part
+    
+    Small files are read in one call sized from fstat; larger ones are
+    encoded chunk by chunk so the raw file is never held in memory next to
+    its encoded copy. Raises FileNotFoundError if file_path does not exist.
+    """
+    with open(file_path, 'rb') as attachment:
+        size = os.fstat(attachment.fileno()).st_size
+        if size <= ATTACHMENT_STREAM_THRESHOLD:
+            payload = base64.encodebytes(attachment.read(size))
+        else:
+            encoded = io.BytesIO()
+            for chunk in iter(lambda: attachment.read(ATTACHMENT_CHUNK_SIZE), b''):
+                encoded.write(base64.encodebytes(chunk))
+            payload = encoded.getvalue()
+    
+    part = MIMEBase('application', 'octet-stream')
+    part.set_payload(payload.decode('ascii'))
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header(
+        'Content-Disposition',
+        f'attachment; filename={os.path.basename(file_path)}'
+    )
+    return part
+
+def _build_message(to_email, subject, body, attachments=None, html=False, parts=None):
+    """
+    Build the MIME message for send_email
+    
+    parts are already-encoded MIME parts attached as-is after the file
+    attachments.
+    """
+    msg = MIMEMultipart()
+    msg['From'] = f'{FROM_NAME} <{FROM_EMAIL}>'
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    if html:
+        msg.attach(MIMEText(body, 'html'))
+    else:
+        msg.attach(MIMEText(body, 'plain'))
+    
+    # Add attachments if any
+    if attachments:
+        for file_path in attachments:
+            try:
+                msg.attach(_attachment_part(file_path))
+            except FileNotFoundError:
+                continue
+    
+    for part in parts or ():
+        msg.attach(part)
+    
+    return msg
+
+def _smtp_connect():
+    """
+    Open an SMTP connection and log in
     """
+    if SMTP_USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_SSL_PORT, context=_SSL_CTX)
+    else:
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        server.starttls(context=_SSL_CTX)
+    server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return server
+
+class SMTPPool:
+    """
+    Pool of logged-in SMTP connections shared between threads
+    
+    get() blocks until a connection is free; put() hands it back after a
+    NOOP keep-alive, reconnecting first if the server dropped it.
+    """
+    
+    def __init__(self, size=10):
+        self._clients = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._clients.put(self._connect())
+    
+    @staticmethod
+    def _connect():
+        try:
+            return _smtp_connect()
+        except Exception as e:
+            print(f"Error opening SMTP connection: {str(e)}")
+            return None
+    
+    def get(self):
+        return self._clients.get()
+    
+    def put(self, client):
+        try:
+            if client is None or client.noop()[0] != 250:
+                raise smtplib.SMTPServerDisconnected('stale connection')
+        except Exception:
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            client = self._connect()
+        self._clients.put(client)
+    
+    def close(self):
+        while True:
+            try:
+                client = self._clients.get_nowait()
+            except queue.Empty:
+                break
+            if client is not None:
+                try:
+                    client.quit()
+                except Exception:
+                    pass
+
+def send_email(to_email, subject, body, attachments=None, html=False, client=None):
+    """
+    Send email with optional attachments
+    
+    Args:
+        to_email: Recipient email address
+        subject: Email subject
+        body: Email body content
+        attachments: List of file paths to attach
+        html: Boolean, if True body is treated as HTML
+        client: Logged-in SMTP connection to reuse (e.g. from SMTPPool);
+                if None a new connection is opened and closed for this email
+    """
+    try:
+        msg = _build_message(to_email, subject, body, attachments, html)
+    except Exception as e:
+        print(f"Error sending email: {str(e)}")
+        return False
+    
+    return _send_message(msg, client)
+
+def _send_message(msg, client=None):
+    """
+    Send a built message, over client if given or a new connection otherwise
+    """
+    try:
+        if client is not None:
+            client.send_message(msg)
+        else:
+            server = _smtp_connect()
+            server.send_message(msg)
+            server.quit()
+        
+        print(f"Email sent successfully to {msg['To']}")
+        return True
+        
+    except Exception as e:
+        print(f"Error sending email: {str(e)}")
+        return False
+
+def _send_pooled(items, build_message, workers, retries):
+    """
+    Build a message for each item and send them concurrently over an SMTPPool
+    
+    A failed send is retried with exponential backoff (1s, 2s, ...) up to
+    `retries` attempts.
+    """
+    items = list(items)
+    if not items:
+        return []
+    
+    size = min(workers, len(items))
+    pool = SMTPPool(size)
+    
+    def send_one(item):
+        msg = build_message(item)
+        for attempt in range(retries):
+            client = pool.get()
+            try:
+                success = _send_message(msg, client)
+            finally:
+                pool.put(client)
+            if success:
+                return {'email': msg['To'], 'success': True}
+            if attempt + 1 < retries:
+                time.sleep(2 ** attempt)
+        return {'email': msg['To'], 'success': False}
+    
+    try:
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            results = list(executor.map(send_one, items))
+    finally:
+        pool.close()
+    
+    return results
+
+def send_acceptance_email(to_email, subject, application_data, pdf_path=None):
+    """
+    Send acceptance email with acceptance letter
+    """
+    html_body = _ACCEPTANCE_TEMPLATE.render(app=application_data)
     
     attachments = [pdf_path] if pdf_path else None
     return send_email(to_email, subject, html_body, attachments, html=True)
@@ -143,4 +315,137 @@ def send_bulk_email(recipients, subject, body, html=False):
     for recipient in recipients:
         success = send_email(recipient, subject, body, html=html)
         results.append({'email': recipient, 'success': success})
-    return results
\ No newline at end of file
+    return results
+
+def send_bulk_email_fast(recipients, subject, body, html=False, workers=15, retries=3):
+    """
+    Send email to multiple recipients concurrently
+    
+    Sends fan out over a thread pool and reuse connections from an
+    SMTPPool instead of logging in per email; failed sends are retried.
+    """
+    def build(recipient):
+        return _build_message(recipient, subject, body, html=html)
+    
+    return _send_pooled(recipients, build, workers, retries)
+
+async def _smtp_connect_async():
+    """
+    Open and log in an aiosmtplib connection, or return None if that fails
+    """
+    if SMTP_USE_SSL:
+        client = aiosmtplib.SMTP(hostname=SMTP_SERVER, port=SMTP_SSL_PORT, use_tls=True,
+                                 tls_context=_SSL_CTX)
+    else:
+        client = aiosmtplib.SMTP(hostname=SMTP_SERVER, port=SMTP_PORT, use_tls=False, start_tls=True,
+                                 tls_context=_SSL_CTX)
+    try:
+        await client.connect()
+        await client.login(SMTP_USERNAME, SMTP_PASSWORD)
+    except Exception as e:
+        print(f"Error opening SMTP connection: {str(e)}")
+        await _smtp_quit_async(client)
+        return None
+    return client
+
+async def _smtp_quit_async(client):
+    """Close an aiosmtplib connection, ignoring errors from a dead one"""
+    try:
+        await client.quit()
+    except Exception:
+        pass
+
+async def send_bulk_email_async(recipients, subject, body, html=False, workers=15, retries=3):
+    """
+    Send email to multiple recipients from async code without threads
+    
+    At most `workers` aiosmtplib connections are opened; each one is logged
+    in once and reused for every recipient it takes off the shared queue.
+    A failed send is retried with backoff like send_bulk_email_fast,
+    reconnecting first if the server dropped the connection. A worker that
+    cannot (re)connect stops and leaves its recipient to the others;
+    recipients are only reported as failed once every worker has stopped.
+    """
+    recipients = list(recipients)
+    if aiosmtplib is None:
+        print("Error sending email: aiosmtplib is not installed")
+        return [{'email': recipient, 'success': False} for recipient in recipients]
+    
+    pending = asyncio.Queue()
+    for index, recipient in enumerate(recipients):
+        pending.put_nowait((index, recipient))
+    results = [None] * len(recipients)
+    
+    async def worker():
+        """Send until the queue is empty; return False if the connection was lost"""
+        client = await _smtp_connect_async()
+        if client is None:
+            return False
+        
+        try:
+            while not pending.empty():
+                index, recipient = pending.get_nowait()
+                msg = _build_message(recipient, subject, body, html=html)
+                success = False
+                for attempt in range(retries):
+                    try:
+                        await client.send_message(msg)
+                        print(f"Email sent successfully to {recipient}")
+                        success = True
+                        break
+                    except Exception as e:
+                        print(f"Error sending email: {str(e)}")
+                    if attempt + 1 < retries:
+                        await asyncio.sleep(2 ** attempt)
+                    if not client.is_connected:
+                        await _smtp_quit_async(client)
+                        client = await _smtp_connect_async()
+                        if client is None:
+                            # Hand the recipient back to a worker that still has a connection
+                            pending.put_nowait((index, recipient))
+                            return False
+                results[index] = {'email': recipient, 'success': success}
+            return True
+        finally:
+            if client is not None:
+                await _smtp_quit_async(client)
+    
+    # Healthy workers may have finished before a failing one handed its
+    # recipient back, so go round again while any worker is still healthy
+    while not pending.empty():
+        healthy = await asyncio.gather(*[worker() for _ in range(min(workers, pending.qsize()))])
+        if not any(healthy):
+            break
+    
+    # Anything still unset was left behind when every worker lost its connection
+    return [result or {'email': recipient, 'success': False}
+            for result, recipient in zip(results, recipients)]
+
+def send_acceptance_batch(applications, pdf_paths_by_id=None,
+                          subject="Congratulations! Your Application Has Been Accepted",
+                          workers=5, retries=3):
+    """
+    Send acceptance emails to a batch of applicants
+    
+    Each application dict holds the fields used by send_acceptance_email plus
+    'email'. pdf_paths_by_id maps application id to its acceptance letter;
+    a letter shared by several applicants is read and encoded only once.
+    """
+    pdf_paths_by_id = pdf_paths_by_id or {}
+    
+    encoded_parts = {}
+    for path in set(pdf_paths_by_id.values()):
+        if not path:
+            continue
+        try:
+            encoded_parts[path] = _attachment_part(path)
+        except FileNotFoundError:
+            continue
+    
+    def build(application_data):
+        html_body = _ACCEPTANCE_TEMPLATE.render(app=application_data)
+        part = encoded_parts.get(pdf_paths_by_id.get(application_data['id']))
+        parts = [copy.copy(part)] if part is not None else None
+        return _build_message(application_data['email'], subject, html_body, html=True, parts=parts)
+    
+    return _send_pooled(applications, build, workers, retries)
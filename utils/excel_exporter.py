@@ -4,33 +4,125 @@ Install: pip install openpyxl
 """
 
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from datetime import datetime
+from operator import itemgetter
+from datetime import date, datetime, timezone
 import os
+import time
 
-def export_applications_to_excel(applications):
+# (header, key) pairs in column order
+_APPLICATION_COLUMNS = (
+    ('ID', 'id'),
+    ('First Name', 'first_name'),
+    ('Last Name', 'last_name'),
+    ('Email', 'email'),
+    ('Phone', 'phone'),
+    ('WhatsApp', 'whatsapp'),
+    ('Date of Birth', 'date_of_birth'),
+    ('Gender', 'gender'),
+    ('NRC Number', 'nrc_number'),
+    ('Address', 'address'),
+    ('City', 'city'),
+    ('Province', 'province'),
+    ('Branch', 'branch'),
+    ('Course Type', 'course_type'),
+    ('Preferred Language', 'preferred_language'),
+    ('Previous Experience', 'previous_experience'),
+    ('Emergency Contact', 'emergency_contact_name'),
+    ('Emergency Phone', 'emergency_contact_phone'),
+    ('Medical Conditions', 'medical_conditions'),
+    ('Status', 'status'),
+    ('Date Applied', 'created_at'),
+    ('Admin Notes', 'admin_notes'),
+)
+_APPLICATION_KEYS = [key for _, key in _APPLICATION_COLUMNS]
+_APPLICATION_DEFAULTS = dict.fromkeys(_APPLICATION_KEYS, '')
+_APPLICATION_GETTER = itemgetter(*_APPLICATION_KEYS)
+_APPLICATION_STATUS_COL = _APPLICATION_KEYS.index('status')
+
+_PAYMENT_COLUMNS = (
+    ('Payment ID', 'id'),
+    ('Student Number', 'student_number'),
+    ('Student Name', 'student_name'),
+    ('Amount', 'amount'),
+    ('Payment Method', 'payment_method'),
+    ('Reference', 'payment_reference'),
+    ('Payment Date', 'payment_date'),
+    ('Received By', 'received_by'),
+    ('Notes', 'notes'),
+)
+_PAYMENT_KEYS = [key for _, key in _PAYMENT_COLUMNS]
+_PAYMENT_DEFAULTS = dict.fromkeys(_PAYMENT_KEYS, '')
+_PAYMENT_GETTER = itemgetter(*_PAYMENT_KEYS)
+
+# Shared cell styles, created once and reused for every data cell
+_DATA_ALIGN = Alignment(vertical="top", wrap_text=True)
+_STATUS_FILLS = {
+    status: PatternFill(start_color=color, end_color=color, fill_type="solid")
+    for status, color in (('accepted', 'D4EDDA'), ('rejected', 'F8D7DA'), ('pending', 'FFF3CD'))
+}
+
+EXPORT_DIR = 'exports/excel'
+_EXPORT_DIR_READY = False
+
+def _ensure_export_dir():
+    """Create the export directory on first use only"""
+    global _EXPORT_DIR_READY
+    if not _EXPORT_DIR_READY:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _EXPORT_DIR_READY = True
+
+def _export_path(name):
+    return f"{EXPORT_DIR}/{name}_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+DATA_STYLE_NAME = 'data_cell'
+DATETIME_STYLE_NAME = 'data_datetime_cell'
+DATE_STYLE_NAME = 'data_date_cell'
+
+def _excel_value(value):
     """
-    Export applications to Excel file
+    Make a value writable as a typed Excel cell
+    
+    Excel has no timezones, so aware datetimes (the models default to
+    datetime.now(timezone.utc)) are converted to naive UTC.
+    """
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _data_cell(ws, value):
+    """Create a write-only cell using the workbook's shared data style"""
+    value = _excel_value(value)
+    cell = WriteOnlyCell(ws, value=value)
+    if isinstance(value, datetime):
+        cell.style = DATETIME_STYLE_NAME
+    elif isinstance(value, date):
+        cell.style = DATE_STYLE_NAME
+    else:
+        cell.style = DATA_STYLE_NAME
+    return cell
+
+def export_applications_to_excel(applications, output=None):
     """
-    # Create exports directory
-    os.makedirs('exports/excel', exist_ok=True)
+    Export applications to Excel file
     
-    filename = f"exports/excel/applications_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    applications may be any iterable of dicts, e.g. a generator fed by a
+    lazily-fetched query; rows are consumed once and never held together.
+    If output (a writable binary file-like object) is given, the workbook is
+    written to it and returned instead of being saved under exports/excel.
+    """
+    if output is None:
+        _ensure_export_dir()
+        output = _export_path('applications')
     
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Applications"
+    # Create workbook (write-only mode streams rows instead of keeping every cell in memory)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Applications")
     
     # Define headers
-    headers = [
-        'ID', 'First Name', 'Last Name', 'Email', 'Phone', 'WhatsApp',
-        'Date of Birth', 'Gender', 'NRC Number', 'Address', 'City', 'Province',
-        'Branch', 'Course Type', 'Preferred Language', 'Previous Experience',
-        'Emergency Contact', 'Emergency Phone', 'Medical Conditions',
-        'Status', 'Date Applied', 'Admin Notes'
-    ]
+    headers = [header for header, _ in _APPLICATION_COLUMNS]
     
     # Style definitions
     header_font = Font(bold=True, color="FFFFFF", size=11)
@@ -44,58 +136,14 @@ def export_applications_to_excel(applications):
         bottom=Side(style='thin', color='000000')
     )
     
-    # Write headers
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = cell_border
+    # Data cells share one named style instead of carrying their own border/alignment
+    wb.add_named_style(NamedStyle(name=DATA_STYLE_NAME, border=cell_border, alignment=_DATA_ALIGN))
+    wb.add_named_style(NamedStyle(name=DATETIME_STYLE_NAME, border=cell_border, alignment=_DATA_ALIGN,
+                                  number_format='yyyy-mm-dd h:mm:ss'))
+    wb.add_named_style(NamedStyle(name=DATE_STYLE_NAME, border=cell_border, alignment=_DATA_ALIGN,
+                                  number_format='yyyy-mm-dd'))
     
-    # Write data
-    for row_num, app in enumerate(applications, 2):
-        data = [
-            app.get('id', ''),
-            app.get('first_name', ''),
-            app.get('last_name', ''),
-            app.get('email', ''),
-            app.get('phone', ''),
-            app.get('whatsapp', ''),
-            str(app.get('date_of_birth', '')),
-            app.get('gender', ''),
-            app.get('nrc_number', ''),
-            app.get('address', ''),
-            app.get('city', ''),
-            app.get('province', ''),
-            app.get('branch', ''),
-            app.get('course_type', ''),
-            app.get('preferred_language', ''),
-            app.get('previous_experience', ''),
-            app.get('emergency_contact_name', ''),
-            app.get('emergency_contact_phone', ''),
-            app.get('medical_conditions', ''),
-            app.get('status', ''),
-            str(app.get('created_at', '')),
-            app.get('admin_notes', '')
-        ]
-        
-        for col_num, value in enumerate(data, 1):
-            cell = ws.cell(row=row_num, column=col_num)
-            cell.value = value
-            cell.border = cell_border
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-            
-            # Color code by status
-            if col_num == 20:  # Status column
-                if value == 'accepted':
-                    cell.fill = PatternFill(start_color="D4EDDA", end_color="D4EDDA", fill_type="solid")
-                elif value == 'rejected':
-                    cell.fill = PatternFill(start_color="F8D7DA", end_color="F8D7DA", fill_type="solid")
-                elif value == 'pending':
-                    cell.fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")
-    
-    # Adjust column widths
+    # Column widths and frozen header must be set before any row is written
     column_widths = {
         'A': 8, 'B': 15, 'C': 15, 'D': 25, 'E': 15, 'F': 15,
         'G': 12, 'H': 10, 'I': 15, 'J': 30, 'K': 15, 'L': 15,
@@ -109,24 +157,52 @@ def export_applications_to_excel(applications):
     # Freeze header row
     ws.freeze_panes = 'A2'
     
+    # Write headers
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        cell.border = cell_border
+        header_row.append(cell)
+    ws.append(header_row)
+    
+    # Write data
+    row_count = 0
+    for app in applications:
+        # Missing keys fall back to '' via the defaults; one C-level call fetches the row
+        data = _APPLICATION_GETTER({**_APPLICATION_DEFAULTS, **app})
+        
+        row = [_data_cell(ws, value) for value in data]
+        
+        # Color code by status
+        status_fill = _STATUS_FILLS.get(data[_APPLICATION_STATUS_COL])
+        if status_fill is not None:
+            row[_APPLICATION_STATUS_COL].fill = status_fill
+        
+        ws.append(row)
+        row_count += 1
+    
     # Add auto-filter
-    ws.auto_filter.ref = ws.dimensions
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{row_count + 1}"
     
     # Save workbook
-    wb.save(filename)
-    return filename
+    wb.save(output)
+    return output
 
-def export_students_to_excel(students):
+def export_students_to_excel(students, output=None):
     """
     Export students to Excel file
-    """
-    os.makedirs('exports/excel', exist_ok=True)
     
-    filename = f"exports/excel/students_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    output works as in export_applications_to_excel.
+    """
+    if output is None:
+        _ensure_export_dir()
+        output = _export_path('students')
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Students"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Students")
     
     headers = [
         'ID', 'Student Number', 'Full Name', 'Email', 'Phone',
@@ -139,18 +215,27 @@ def export_students_to_excel(students):
     header_fill = PatternFill(start_color="DC2626", end_color="DC2626", fill_type="solid")
     header_alignment = Alignment(horizontal="center", vertical="center")
     
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
+    # Adjust column widths
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 15
+    
+    ws.freeze_panes = 'A2'
+    
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
     
     # Write student data
-    for row_num, student in enumerate(students, 2):
+    row_count = 0
+    for student in students:
         balance = float(student.get('total_fee', 0)) - float(student.get('amount_paid', 0))
         
-        data = [
+        data = (
             student.get('id', ''),
             student.get('student_number', ''),
             f"{student.get('first_name', '')} {student.get('last_name', '')}",
@@ -158,75 +243,59 @@ def export_students_to_excel(students):
             student.get('phone', ''),
             student.get('branch', ''),
             student.get('course_type', ''),
-            str(student.get('enrollment_date', '')),
-            str(student.get('course_start_date', '')),
-            str(student.get('course_end_date', '')),
+            _excel_value(student.get('enrollment_date', '')),
+            _excel_value(student.get('course_start_date', '')),
+            _excel_value(student.get('course_end_date', '')),
             student.get('status', ''),
             student.get('payment_status', ''),
             student.get('total_fee', ''),
             student.get('amount_paid', ''),
             balance
-        ]
+        )
         
-        for col_num, value in enumerate(data, 1):
-            cell = ws.cell(row=row_num, column=col_num)
-            cell.value = value
-    
-    # Adjust column widths
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col)].width = 15
+        ws.append(data)
+        row_count += 1
     
-    ws.freeze_panes = 'A2'
-    ws.auto_filter.ref = ws.dimensions
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{row_count + 1}"
     
-    wb.save(filename)
-    return filename
+    wb.save(output)
+    return output
 
-def export_payments_to_excel(payments):
+def export_payments_to_excel(payments, output=None):
     """
     Export payment records to Excel
+    
+    output works as in export_applications_to_excel.
     """
-    os.makedirs('exports/excel', exist_ok=True)
+    if output is None:
+        _ensure_export_dir()
+        output = _export_path('payments')
     
-    filename = f"exports/excel/payments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Payments")
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Payments"
+    headers = [header for header, _ in _PAYMENT_COLUMNS]
     
-    headers = [
-        'Payment ID', 'Student Number', 'Student Name', 'Amount',
-        'Payment Method', 'Reference', 'Payment Date', 'Received By', 'Notes'
-    ]
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 15
+    
+    ws.freeze_panes = 'A2'
     
     # Apply styling
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = Font(bold=True, color="FFFFFF")
         cell.fill = PatternFill(start_color="DC2626", end_color="DC2626", fill_type="solid")
         cell.alignment = Alignment(horizontal="center", vertical="center")
+        header_row.append(cell)
+    ws.append(header_row)
     
     # Write data
-    for row_num, payment in enumerate(payments, 2):
-        data = [
-            payment.get('id', ''),
-            payment.get('student_number', ''),
-            payment.get('student_name', ''),
-            payment.get('amount', ''),
-            payment.get('payment_method', ''),
-            payment.get('payment_reference', ''),
-            str(payment.get('payment_date', '')),
-            payment.get('received_by', ''),
-            payment.get('notes', '')
-        ]
+    for payment in payments:
+        data = _PAYMENT_GETTER({**_PAYMENT_DEFAULTS, **payment})
         
-        for col_num, value in enumerate(data, 1):
-            ws.cell(row=row_num, column=col_num).value = value
+        ws.append(tuple(map(_excel_value, data)))
     
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col)].width = 15
-    
-    ws.freeze_panes = 'A2'
-    wb.save(filename)
-    return filename
\ No newline at end of file
+    wb.save(output)
+    return output
\ No newline at end of file
@@ -1,17 +1,28 @@
 """
 Complete PDF Generation Utility for KEEM Driving School
 """
+from reportlab import rl_config
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch, cm
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Preformatted, Spacer, Table, TableStyle, Image
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from decimal import Decimal
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import escape
+import hashlib
+import heapq
+import importlib
+import io
 import os
+import re
+import tempfile
 import locale
 
 # Set locale for currency formatting
@@ -20,39 +31,454 @@ try:
 except:
     pass
 
-def format_currency(amount):
+# Page streams are Flate-compressed unless KEEM_PDF_COMPRESS is 0/false/no/off,
+# e.g. when the HTTP layer already gzips responses. Invariant output drops the
+# per-build timestamp and document ID, so identical input renders identical bytes.
+rl_config.pageCompression = int(
+    os.environ.get('KEEM_PDF_COMPRESS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+)
+rl_config.invariant = 1
+
+# WeasyPrint is optional: without it the student report is laid out with ReportLab.
+# It raises OSError rather than ImportError when its pango/gobject system
+# libraries are missing, which is common on shared hosting.
+try:
+    from weasyprint import HTML, CSS
+except (ImportError, OSError):
+    HTML = CSS = None
+
+# Created once at import so the file wrappers never need to check
+PDF_EXPORT_DIRS = (
+    'exports/pdf/applications',
+    'exports/pdf/acceptance_letters',
+    'exports/pdf/invoices',
+    'exports/pdf/student_reports',
+)
+for _export_dir in PDF_EXPORT_DIRS:
+    os.makedirs(_export_dir, exist_ok=True)
+
+_STYLES = None
+
+def _styles():
+    """Return the shared sample stylesheet, building it on first use"""
+    global _STYLES
+    if _STYLES is None:
+        _STYLES = getSampleStyleSheet()
+    return _STYLES
+
+_REGISTERED_FONTS = set()
+
+def _ensure_font(name, path):
+    """
+    Register a TrueType font with ReportLab once per process
+    
+    Load custom fonts through this helper rather than calling
+    pdfmetrics.registerFont directly from the generators.
+    """
+    if name not in _REGISTERED_FONTS:
+        pdfmetrics.registerFont(TTFont(name, path))
+        _REGISTERED_FONTS.add(name)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _compact(markup):
+    """
+    Collapse whitespace runs in Paragraph markup to single spaces
+    
+    Paragraph otherwise re-cleans multi-line text line by line on every
+    build; compacted text leaves that pass with nothing to do.
+    """
+    return _WHITESPACE_RE.sub(' ', markup).strip()
+
+def _row(*parts):
+    """
+    Escape each part once and join them into Paragraph markup, one per line
+    
+    Use this for free text from the database so a stray '<' or '&' in a
+    field cannot break (or inject into) the Paragraph markup.
+    """
+    return '<br/>'.join([escape(part) for part in parts])
+
+def _plain_line(text, style):
+    """
+    A single line of fixed label text without markup
+    
+    Preformatted skips Paragraph's XML parsing and line wrapping, so only
+    use it for short literal lines that can never need to wrap; anything
+    containing database values goes through Paragraph(_row(...)).
+    """
+    return Preformatted(text, style)
+
+def _cache_key(*values):
+    """Short stable hash of the values a cached PDF depends on"""
+    h = hashlib.blake2b(digest_size=16)
+    for value in values:
+        h.update(repr(value).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+def _build_cached(filename, build):
+    """
+    Return filename if it was already rendered, otherwise build it
+    
+    build(path) renders to a unique temporary file next to filename that is
+    renamed into place, so a concurrent request never picks up a
+    half-written file and a failed build leaves nothing behind.
+    """
+    if os.path.exists(filename):
+        return filename
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(filename))
+    os.close(fd)
+    try:
+        build(tmp)
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; keep the usual export permissions
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return filename
+
+def format_currency(amount, _fmt='{:,.2f}'.format):
     """Format amount as currency"""
     try:
-        return f"ZMW {float(amount):,.2f}"
+        # Numbers, including the models' Decimal amounts, skip the float() round-trip
+        return 'ZMW ' + _fmt(amount if isinstance(amount, (int, float, Decimal)) else float(amount))
     except:
         return f"ZMW {amount}"
 
-def generate_application_pdf(application):
+# HTML report templates and their stylesheet, loaded once per process
+_PDF_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'pdf')
+_PDF_TEMPLATES = Environment(loader=FileSystemLoader(_PDF_TEMPLATE_DIR), autoescape=True)
+_PDF_TEMPLATES.filters['currency'] = format_currency
+_STUDENT_REPORT_CSS = CSS(filename=os.path.join(_PDF_TEMPLATE_DIR, 'student_report.css')) if CSS is not None else None
+
+# Brand colours, parsed once
+_RED = colors.HexColor('#DC2626')
+_DARK_GRAY = colors.HexColor('#1F2937')
+_MUTED_GRAY = colors.HexColor('#6B7280')
+_BORDER_GRAY = colors.HexColor('#E5E7EB')
+_LABEL_BG = colors.HexColor('#F3F4F6')
+_ROW_BG = colors.HexColor('#F9FAFB')
+_NOTES_BG = colors.HexColor('#FEF3C7')
+_NOTES_BORDER = colors.HexColor('#F59E0B')
+_BALANCE_DUE_BG = colors.HexColor('#FEF2F2')
+_BALANCE_CLEAR_BG = colors.HexColor('#F0FDF4')
+
+# Paragraph styles shared by every document; ReportLab only reads them
+_FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=_styles()['Normal'],
+    fontSize=8,
+    textColor=_MUTED_GRAY,
+    alignment=TA_CENTER
+)
+
+_APPLICATION_TITLE_STYLE = ParagraphStyle(
+    'Title',
+    parent=_styles()['Heading1'],
+    fontSize=16,
+    textColor=_RED,
+    spaceAfter=20,
+    alignment=TA_CENTER
+)
+
+_SECTION_HEADER_STYLE = ParagraphStyle(
+    'SectionHeader',
+    parent=_styles()['Heading2'],
+    fontSize=12,
+    textColor=_DARK_GRAY,
+    spaceAfter=10,
+    spaceBefore=20
+)
+
+_NOTES_STYLE = ParagraphStyle(
+    'Notes',
+    parent=_styles()['Normal'],
+    fontSize=10,
+    textColor=_MUTED_GRAY,
+    backColor=_NOTES_BG,
+    borderPadding=10,
+    borderColor=_NOTES_BORDER,
+    borderWidth=1
+)
+
+_LETTERHEAD_STYLE = ParagraphStyle(
+    'Letterhead',
+    parent=_styles()['Normal'],
+    fontSize=10,
+    textColor=_MUTED_GRAY,
+    alignment=TA_RIGHT,
+    spaceAfter=20
+)
+
+# The acceptance letter's letterhead never changes, so it is drawn straight
+# onto the canvas instead of being laid out as a Paragraph for every letter
+_LETTERHEAD_LINES = (
+    "KEEM Driving School",
+    "Excellence in Driver Training",
+    "Plot 123, Main Street, Luanshya",
+    "Phone: +260 123 456 789 | Email: info@keemdrivingschool.com",
+)
+_LETTERHEAD_HEIGHT = len(_LETTERHEAD_LINES) * _LETTERHEAD_STYLE.leading + _LETTERHEAD_STYLE.spaceAfter
+
+def _draw_letterhead(canv, doc):
     """
-    Generate detailed PDF for a single application
+    onFirstPage callback: draw the letterhead right-aligned in the space
+    reserved for it at the top of the first frame
+    """
+    frame_padding = 6
+    right = doc.leftMargin + doc.width - frame_padding
+    y = doc.pagesize[1] - doc.topMargin - frame_padding - _LETTERHEAD_STYLE.fontSize
+    canv.saveState()
+    canv.setFont(_LETTERHEAD_STYLE.fontName, _LETTERHEAD_STYLE.fontSize)
+    canv.setFillColor(_LETTERHEAD_STYLE.textColor)
+    for line in _LETTERHEAD_LINES:
+        canv.drawRightString(right, y, line)
+        y -= _LETTERHEAD_STYLE.leading
+    canv.restoreState()
+
+_DATE_STYLE = ParagraphStyle('Date', parent=_styles()['Normal'], fontSize=10, spaceAfter=20)
+_REFERENCE_STYLE = ParagraphStyle('Reference', parent=_styles()['Normal'], fontSize=10, spaceAfter=30)
+_RECIPIENT_STYLE = ParagraphStyle('Recipient', parent=_styles()['Normal'], fontSize=11, spaceAfter=30)
+
+_SUBJECT_STYLE = ParagraphStyle(
+    'Subject',
+    parent=_styles()['Heading2'],
+    fontSize=12,
+    textColor=_DARK_GRAY,
+    spaceAfter=20
+)
+
+_SALUTATION_STYLE = ParagraphStyle('Salutation', parent=_styles()['Normal'], fontSize=11, spaceAfter=10)
+
+_BODY_STYLE = ParagraphStyle(
+    'Body',
+    parent=_styles()['Normal'],
+    fontSize=11,
+    leading=14,
+    spaceAfter=10,
+    alignment=TA_JUSTIFY
+)
+
+_CLOSING_STYLE = ParagraphStyle('Closing', parent=_styles()['Normal'], fontSize=11, spaceAfter=5)
+_SIGNATURE_STYLE = ParagraphStyle('Signature', parent=_styles()['Normal'], fontSize=11, spaceAfter=20)
+
+_INVOICE_SECTION_STYLE = ParagraphStyle(
+    'InvoiceSection',
+    parent=_styles()['Heading3'],
+    fontSize=10,
+    textColor=_DARK_GRAY,
+    spaceAfter=5
+)
+
+# Invoice cell styles, shared by every row instead of rebuilt per cell
+_ITEM_STYLE = ParagraphStyle('Item', parent=_styles()['Normal'], fontSize=9)
+_ITEM_RIGHT_STYLE = ParagraphStyle('ItemRight', parent=_styles()['Normal'], fontSize=9, alignment=TA_RIGHT)
+_BILL_TO_DETAILS_STYLE = ParagraphStyle('BillToDetails', parent=_styles()['Normal'], fontSize=9)
+
+_ITEMS_HEADER_STYLE = ParagraphStyle(
+    'ItemsHeader',
+    parent=_styles()['Normal'],
+    fontSize=9,
+    textColor=colors.white,
+    alignment=TA_CENTER
+)
+
+_BALANCE_STYLE = ParagraphStyle('Balance', parent=_styles()['Normal'], fontSize=9, textColor=_MUTED_GRAY)
+
+_REPORT_TITLE_STYLE = ParagraphStyle(
+    'Title',
+    parent=_styles()['Heading1'],
+    fontSize=14,
+    textColor=_RED,
+    spaceAfter=10,
+    alignment=TA_CENTER
+)
+
+_REPORT_INFO_STYLE = ParagraphStyle(
+    'Info',
+    parent=_styles()['Normal'],
+    fontSize=10,
+    alignment=TA_CENTER,
+    spaceAfter=20
+)
+
+_REPORT_SECTION_STYLE = ParagraphStyle(
+    'ProgressHeader',
+    parent=_styles()['Heading2'],
+    fontSize=12,
+    textColor=_DARK_GRAY,
+    spaceAfter=10
+)
+
+# Table styles
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), _LABEL_BG),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+_DETAILS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), _ROW_BG),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, _BORDER_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+])
+
+_INVOICE_HEADER_TABLE_STYLE = TableStyle([
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 20),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+])
+
+_BILL_TO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), _ROW_BG),
+    ('BOX', (0, 0), (-1, -1), 0.5, _BORDER_GRAY),
+    ('PADDING', (0, 0), (-1, -1), 10),
+])
+
+_ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), _RED),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 0.5, _BORDER_GRAY),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+_TOTALS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+_PAYMENT_DETAILS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+_STUDENT_DETAILS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), _LABEL_BG),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, _BORDER_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+])
+
+_REPORT_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+# Financial summary variants, picked by whether the student still owes money
+_BALANCE_DUE_TABLE_STYLE = TableStyle(
+    [('BACKGROUND', (2, 2), (2, 2), _BALANCE_DUE_BG)], parent=_REPORT_TABLE_STYLE
+)
+_BALANCE_CLEAR_TABLE_STYLE = TableStyle(
+    [('BACKGROUND', (2, 2), (2, 2), _BALANCE_CLEAR_BG)], parent=_REPORT_TABLE_STYLE
+)
+
+_LESSONS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), _RED),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, _BORDER_GRAY),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+])
+
+# Static markup shared by every document. Paragraph objects themselves are
+# not cached: layout mutates them, so each build needs its own
+_SIGNATURE_HTML = (
+    "_________________________<br/>"
+    "<b>KEEM Driving School Management</b><br/>"
+    "Director"
+)
+
+_LETTER_FOOTER_HTML = (
+    "KEEM Driving School | Excellence in Driver Training | "
+    "Luanshya & Mufulira Branches | License No: XYZ12345"
+)
+
+_INVOICE_LETTERHEAD_HTML = (
+    "<b>KEEM DRIVING SCHOOL</b><br/>"
+    "Excellence in Driver Training<br/>"
+    "Plot 123, Main Street, Luanshya<br/>"
+    "Phone: +260 123 456 789<br/>"
+    "Email: info@keemdrivingschool.com"
+)
+
+_INVOICE_FOOTER_HTML = (
+    "Thank you for your payment!<br/>"
+    "This invoice is computer generated and does not require a signature.<br/>"
+    "For any inquiries, please contact info@keemdrivingschool.com or call +260 123 456 789"
+)
+
+# Column widths, computed once
+_COL_4_10 = (4*cm, 10*cm)
+_COL_4_12 = (4*cm, 12*cm)
+_COL_5_11 = (5*cm, 11*cm)
+_COL_6_10 = (6*cm, 10*cm)
+_COL_14_2 = (14*cm, 2*cm)
+_INVOICE_HEADER_COL_WIDTHS = (10*cm, 6*cm)
+_ITEMS_COL_WIDTHS = (7*cm, 3*cm, 4*cm, 2*cm)
+_LESSONS_COL_WIDTHS = (3*cm, 3*cm, 3*cm, 2*cm, 5*cm)
+
+def _kv_table(rows, style=_DETAILS_TABLE_STYLE, col_widths=_COL_4_10):
+    """Build a label/value Table with a shared style and column widths"""
+    table = Table(rows, colWidths=col_widths)
+    table.setStyle(style)
+    return table
+
+def warm_up():
     """
-    os.makedirs('exports/pdf/applications', exist_ok=True)
+    Build a throwaway one-page PDF so the first real request doesn't pay
+    for ReportLab's lazy setup (markup parser, font metrics, table layout)
+    """
+    try:
+        doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4)
+        doc.build([
+            Paragraph("<b>KEEM</b> Driving School", _BODY_STYLE),
+            _plain_line("Warm-up", _REFERENCE_STYLE),
+            _kv_table([["Total:", format_currency(0)]]),
+        ])
+    except Exception as e:
+        print(f"Error warming up PDF generation: {str(e)}")
+
+def generate_application_pdf(application, output=None):
+    """
+    Generate detailed PDF for a single application
     
-    filename = f"exports/pdf/applications/application_{application.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    Renders into output (a file path or writable file-like object) and
+    returns it; if output is None the PDF is built in memory and its bytes
+    are returned.
+    """
+    course = application.course
+    branch = application.branch
+    buffer = io.BytesIO() if output is None else output
     
-    doc = SimpleDocTemplate(filename, pagesize=A4,
+    doc = SimpleDocTemplate(buffer, pagesize=A4,
                           topMargin=1*cm, bottomMargin=1*cm,
                           leftMargin=1.5*cm, rightMargin=1.5*cm)
     
     story = []
-    styles = getSampleStyleSheet()
     
     # Title
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#DC2626'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    title = Paragraph("KEEM DRIVING SCHOOL - APPLICATION FORM", title_style)
+    title = Paragraph("KEEM DRIVING SCHOOL - APPLICATION FORM", _APPLICATION_TITLE_STYLE)
     story.append(title)
     
     # Application Summary
@@ -60,33 +486,17 @@ def generate_application_pdf(application):
         ["Application Number:", application.application_number],
         ["Application Date:", application.application_date.strftime('%B %d, %Y')],
         ["Status:", f"<b>{application.status.upper()}</b>"],
-        ["Branch:", application.branch.name if application.branch else 'N/A'],
-        ["Course Applied:", application.course.name if application.course else 'N/A']
+        ["Branch:", branch.name if branch else 'N/A'],
+        ["Course Applied:", course.name if course else 'N/A']
     ]
     
-    summary_table = Table(summary_data, colWidths=[4*cm, 10*cm])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F3F4F6')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
+    summary_table = _kv_table(summary_data, _SUMMARY_TABLE_STYLE)
     story.append(summary_table)
     
     story.append(Spacer(1, 20))
     
     # Personal Information
-    header_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=10,
-        spaceBefore=20
-    )
-    
-    story.append(Paragraph("Personal Information", header_style))
+    story.append(_plain_line("Personal Information", _SECTION_HEADER_STYLE))
     
     personal_data = [
         ["Full Name:", f"{application.first_name} {application.last_name}"],
@@ -102,49 +512,31 @@ def generate_application_pdf(application):
         ["Province:", application.province]
     ]
     
-    personal_table = Table(personal_data, colWidths=[4*cm, 10*cm])
-    personal_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F9FAFB')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    personal_table = _kv_table(personal_data)
     story.append(personal_table)
     
     story.append(Spacer(1, 20))
     
     # Course Information
-    story.append(Paragraph("Course Information", header_style))
+    story.append(_plain_line("Course Information", _SECTION_HEADER_STYLE))
     
     course_data = [
-        ["Course Name:", application.course.name if application.course else 'N/A'],
-        ["Course Code:", application.course.code if application.course else 'N/A'],
-        ["Category:", application.course.category if application.course else 'N/A'],
-        ["Duration:", f"{application.course.duration_weeks} weeks ({application.course.total_hours} hours)" if application.course else 'N/A'],
-        ["Course Fee:", format_currency(application.course.fee) if application.course else 'N/A'],
+        ["Course Name:", course.name if course else 'N/A'],
+        ["Course Code:", course.code if course else 'N/A'],
+        ["Category:", course.category if course else 'N/A'],
+        ["Duration:", f"{course.duration_weeks} weeks ({course.total_hours} hours)" if course else 'N/A'],
+        ["Course Fee:", format_currency(course.fee) if course else 'N/A'],
         ["Preferred Schedule:", application.preferred_schedule or 'Flexible'],
         ["Preferred Language:", application.preferred_language or 'English']
     ]
     
-    course_table = Table(course_data, colWidths=[4*cm, 10*cm])
-    course_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F9FAFB')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    course_table = _kv_table(course_data)
     story.append(course_table)
     
     story.append(Spacer(1, 20))
     
     # Background Information
-    story.append(Paragraph("Background Information", header_style))
+    story.append(_plain_line("Background Information", _SECTION_HEADER_STYLE))
     
     background_data = [
         ["Education Level:", application.education_level or 'Not specified'],
@@ -152,22 +544,13 @@ def generate_application_pdf(application):
         ["Medical Conditions:", application.medical_conditions or 'None']
     ]
     
-    background_table = Table(background_data, colWidths=[4*cm, 10*cm])
-    background_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F9FAFB')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    background_table = _kv_table(background_data)
     story.append(background_table)
     
     story.append(Spacer(1, 20))
     
     # Emergency Contact
-    story.append(Paragraph("Emergency Contact", header_style))
+    story.append(_plain_line("Emergency Contact", _SECTION_HEADER_STYLE))
     
     emergency_data = [
         ["Name:", application.emergency_name],
@@ -175,192 +558,113 @@ def generate_application_pdf(application):
         ["Relationship:", application.emergency_relation or 'Not specified']
     ]
     
-    emergency_table = Table(emergency_data, colWidths=[4*cm, 10*cm])
-    emergency_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F9FAFB')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    emergency_table = _kv_table(emergency_data)
     story.append(emergency_table)
     
     # Admin Notes (if any)
     if application.admin_notes:
         story.append(Spacer(1, 20))
-        story.append(Paragraph("Administrative Notes", header_style))
+        story.append(_plain_line("Administrative Notes", _SECTION_HEADER_STYLE))
         
-        notes_style = ParagraphStyle(
-            'Notes',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#6B7280'),
-            backColor=colors.HexColor('#FEF3C7'),
-            borderPadding=10,
-            borderColor=colors.HexColor('#F59E0B'),
-            borderWidth=1
-        )
-        
-        notes = Paragraph(application.admin_notes, notes_style)
+        notes = Paragraph(escape(_compact(application.admin_notes)), _NOTES_STYLE)
         story.append(notes)
     
     # Footer
     story.append(Spacer(1, 30))
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_CENTER
-    )
-    
     footer = Paragraph(
         f"Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | "
-        f"KEEM Driving School | {application.branch.name if application.branch else 'Main Branch'}",
-        footer_style
+        f"KEEM Driving School | {escape(branch.name) if branch else 'Main Branch'}",
+        _FOOTER_STYLE
     )
     story.append(footer)
     
     # Build PDF
     doc.build(story)
-    return filename
+    return buffer.getvalue() if output is None else output
 
-def generate_acceptance_letter(application):
+def generate_application_pdf_to_file(application):
     """
-    Generate official acceptance letter PDF
+    Save the application PDF under exports/pdf/applications and return its path
     """
-    os.makedirs('exports/pdf/acceptance_letters', exist_ok=True)
+    filename = f"exports/pdf/applications/application_{application.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return generate_application_pdf(application, filename)
+
+def generate_acceptance_letter(application, output=None):
+    """
+    Generate official acceptance letter PDF
     
-    filename = f"exports/pdf/acceptance_letters/acceptance_{application.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    output works as in generate_application_pdf.
+    """
+    course = application.course
+    branch = application.branch
+    buffer = io.BytesIO() if output is None else output
     
-    doc = SimpleDocTemplate(filename, pagesize=A4,
+    doc = SimpleDocTemplate(buffer, pagesize=A4,
                           topMargin=2*cm, bottomMargin=2*cm,
                           leftMargin=2.5*cm, rightMargin=2.5*cm)
     
     story = []
-    styles = getSampleStyleSheet()
-    
-    # Letterhead
-    letterhead_style = ParagraphStyle(
-        'Letterhead',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_RIGHT,
-        spaceAfter=20
-    )
     
-    letterhead = Paragraph(
-        "KEEM Driving School<br/>"
-        "Excellence in Driver Training<br/>"
-        "Plot 123, Main Street, Luanshya<br/>"
-        "Phone: +260 123 456 789 | Email: info@keemdrivingschool.com",
-        letterhead_style
-    )
-    story.append(letterhead)
+    # Letterhead (drawn onto the first page by _draw_letterhead; reserve its space here)
+    story.append(Spacer(1, _LETTERHEAD_HEIGHT))
     
     # Date
-    date_style = ParagraphStyle(
-        'Date',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=20
-    )
-    
-    date = Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", date_style)
+    date = _plain_line(f"Date: {datetime.now().strftime('%B %d, %Y')}", _DATE_STYLE)
     story.append(date)
     
     # Reference
-    ref_style = ParagraphStyle(
-        'Reference',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=30
-    )
-    
-    ref = Paragraph(f"Reference: {application.application_number}", ref_style)
+    ref = Paragraph(_row(f"Reference: {application.application_number}"), _REFERENCE_STYLE)
     story.append(ref)
     
     # Recipient Address
-    recipient_style = ParagraphStyle(
-        'Recipient',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=30
-    )
-    
     recipient = Paragraph(
-        f"{application.first_name} {application.last_name}<br/>"
-        f"{application.address}<br/>"
-        f"{application.city}, {application.province}<br/>"
-        f"Phone: {application.phone}<br/>"
-        f"Email: {application.email}",
-        recipient_style
+        _row(
+            f"{application.first_name} {application.last_name}",
+            _compact(application.address),
+            f"{application.city}, {application.province}",
+            f"Phone: {application.phone}",
+            f"Email: {application.email}",
+        ),
+        _RECIPIENT_STYLE
     )
     story.append(recipient)
     
     # Subject
-    subject_style = ParagraphStyle(
-        'Subject',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=20
-    )
-    
-    subject = Paragraph("LETTER OF ACCEPTANCE", subject_style)
+    subject = _plain_line("LETTER OF ACCEPTANCE", _SUBJECT_STYLE)
     story.append(subject)
     
     # Salutation
-    salutation_style = ParagraphStyle(
-        'Salutation',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=10
-    )
-    
-    salutation = Paragraph(f"Dear {application.first_name} {application.last_name},", salutation_style)
+    salutation = Paragraph(f"Dear {_row(f'{application.first_name} {application.last_name}')},", _SALUTATION_STYLE)
     story.append(salutation)
     
     # Body
-    body_style = ParagraphStyle(
-        'Body',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=14,
-        spaceAfter=10,
-        alignment=TA_JUSTIFY
-    )
-    
     body_text = [
         Paragraph(
             "We are pleased to inform you that your application to KEEM Driving School has been <b>ACCEPTED</b>. "
             "Congratulations on taking this important step towards becoming a certified driver!",
-            body_style
+            _BODY_STYLE
         ),
         Spacer(1, 10),
-        Paragraph("<b>Application Details:</b>", body_style),
-        Paragraph(f"Application Number: {application.application_number}", body_style),
-        Paragraph(f"Course: {application.course.name if application.course else 'N/A'}", body_style),
-        Paragraph(f"Branch: {application.branch.name if application.branch else 'N/A'}", body_style),
+        Paragraph("<b>Application Details:</b>", _BODY_STYLE),
+        Paragraph(_row(f"Application Number: {application.application_number}"), _BODY_STYLE),
+        Paragraph(_row(f"Course: {course.name if course else 'N/A'}"), _BODY_STYLE),
+        Paragraph(_row(f"Branch: {branch.name if branch else 'N/A'}"), _BODY_STYLE),
         Spacer(1, 10),
-        Paragraph("<b>Next Steps:</b>", body_style),
-        Paragraph("1. Visit our branch office within 7 days to complete enrollment", body_style),
-        Paragraph("2. Bring the following documents:", body_style),
-        Paragraph("   • Original NRC and 2 photocopies", body_style),
-        Paragraph("   • 2 passport-sized photographs", body_style),
-        Paragraph("   • Medical certificate (if applicable)", body_style),
-        Paragraph("3. Pay the registration fee of ZMW 500", body_style),
-        Paragraph("4. Receive your training schedule and student ID", body_style),
-        Paragraph("5. Attend the orientation session", body_style),
+        Paragraph("<b>Next Steps:</b>", _BODY_STYLE),
+        _plain_line("1. Visit our branch office within 7 days to complete enrollment", _BODY_STYLE),
+        _plain_line("2. Bring the following documents:", _BODY_STYLE),
+        _plain_line("• Original NRC and 2 photocopies", _BODY_STYLE),
+        _plain_line("• 2 passport-sized photographs", _BODY_STYLE),
+        _plain_line("• Medical certificate (if applicable)", _BODY_STYLE),
+        _plain_line("3. Pay the registration fee of ZMW 500", _BODY_STYLE),
+        _plain_line("4. Receive your training schedule and student ID", _BODY_STYLE),
+        _plain_line("5. Attend the orientation session", _BODY_STYLE),
         Spacer(1, 10),
         Paragraph(
             "Our team will contact you within 2 business days to schedule your orientation session. "
             "Welcome to KEEM Driving School! We look forward to helping you achieve your driving goals.",
-            body_style
+            _BODY_STYLE
         )
     ]
     
@@ -370,176 +674,118 @@ def generate_acceptance_letter(application):
     story.append(Spacer(1, 30))
     
     # Closing
-    closing_style = ParagraphStyle(
-        'Closing',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=5
-    )
-    
-    closing = Paragraph("Sincerely,", closing_style)
+    closing = _plain_line("Sincerely,", _CLOSING_STYLE)
     story.append(closing)
     
     story.append(Spacer(1, 40))
     
     # Signature
-    signature_style = ParagraphStyle(
-        'Signature',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=20
-    )
-    
-    signature = Paragraph(
-        "_________________________<br/>"
-        "<b>KEEM Driving School Management</b><br/>"
-        "Director",
-        signature_style
-    )
+    signature = Paragraph(_SIGNATURE_HTML, _SIGNATURE_STYLE)
     story.append(signature)
     
     # Footer
     story.append(Spacer(1, 30))
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_CENTER
-    )
-    
-    footer = Paragraph(
-        "KEEM Driving School | Excellence in Driver Training | "
-        "Luanshya & Mufulira Branches | License No: XYZ12345",
-        footer_style
-    )
+    footer = Paragraph(_LETTER_FOOTER_HTML, _FOOTER_STYLE)
     story.append(footer)
     
     # Build PDF
-    doc.build(story)
-    return filename
+    doc.build(story, onFirstPage=_draw_letterhead)
+    return buffer.getvalue() if output is None else output
 
-def generate_invoice_pdf(payment):
+def generate_acceptance_letter_to_file(application):
     """
-    Generate invoice PDF for payment
+    Save the acceptance letter under exports/pdf/acceptance_letters and return its path
+    
+    The letter is reused until the application's status or record changes.
+    """
+    key = _cache_key(application.id, application.status, application.updated_at)
+    filename = f"exports/pdf/acceptance_letters/acceptance_{application.id}_{key}.pdf"
+    return _build_cached(filename, lambda path: generate_acceptance_letter(application, path))
+
+def generate_invoice_pdf(payment, output=None):
     """
-    os.makedirs('exports/pdf/invoices', exist_ok=True)
+    Generate invoice PDF for payment
     
-    filename = f"exports/pdf/invoices/invoice_{payment.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    output works as in generate_application_pdf.
+    """
+    student = payment.student
+    applicant = student.application if student else None
+    buffer = io.BytesIO() if output is None else output
     
-    doc = SimpleDocTemplate(filename, pagesize=A4,
+    doc = SimpleDocTemplate(buffer, pagesize=A4,
                           topMargin=1.5*cm, bottomMargin=1.5*cm,
                           leftMargin=2*cm, rightMargin=2*cm)
     
     story = []
-    styles = getSampleStyleSheet()
     
     # Header
     header_table_data = [
         [
-            Paragraph(
-                "<b>KEEM DRIVING SCHOOL</b><br/>"
-                "Excellence in Driver Training<br/>"
-                "Plot 123, Main Street, Luanshya<br/>"
-                "Phone: +260 123 456 789<br/>"
-                "Email: info@keemdrivingschool.com",
-                ParagraphStyle('Left', parent=styles['Normal'], fontSize=9)
-            ),
+            Paragraph(_INVOICE_LETTERHEAD_HTML, _ITEM_STYLE),
             Paragraph(
                 "<b>INVOICE</b><br/>"
                 f"Date: {datetime.now().strftime('%B %d, %Y')}<br/>"
-                f"Invoice #: {payment.payment_number}<br/>"
+                f"Invoice #: {escape(payment.payment_number)}<br/>"
                 f"Status: <font color='green'><b>PAID</b></font>",
-                ParagraphStyle('Right', parent=styles['Normal'], fontSize=9, alignment=TA_RIGHT)
+                _ITEM_RIGHT_STYLE
             )
         ]
     ]
     
-    header_table = Table(header_table_data, colWidths=[10*cm, 6*cm])
-    header_table.setStyle(TableStyle([
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 20),
-        ('TOPPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    header_table = Table(header_table_data, colWidths=_INVOICE_HEADER_COL_WIDTHS)
+    header_table.setStyle(_INVOICE_HEADER_TABLE_STYLE)
     story.append(header_table)
     
     # Bill To
     story.append(Spacer(1, 10))
     
-    bill_to_style = ParagraphStyle(
-        'BillTo',
-        parent=styles['Heading3'],
-        fontSize=10,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=5
-    )
-    
-    story.append(Paragraph("BILL TO", bill_to_style))
+    story.append(_plain_line("BILL TO", _INVOICE_SECTION_STYLE))
     
-    if payment.student and payment.student.application:
+    if applicant:
         bill_to_data = [
             [
                 Paragraph(
-                    f"{payment.student.application.first_name} {payment.student.application.last_name}<br/>"
-                    f"{payment.student.application.address}<br/>"
-                    f"{payment.student.application.city}, {payment.student.application.province}<br/>"
-                    f"Phone: {payment.student.application.phone}<br/>"
-                    f"Email: {payment.student.application.email}",
-                    ParagraphStyle('BillToDetails', parent=styles['Normal'], fontSize=9)
+                    _row(
+                        f"{applicant.first_name} {applicant.last_name}",
+                        _compact(applicant.address),
+                        f"{applicant.city}, {applicant.province}",
+                        f"Phone: {applicant.phone}",
+                        f"Email: {applicant.email}",
+                    ),
+                    _BILL_TO_DETAILS_STYLE
                 )
             ]
         ]
         
         bill_to_table = Table(bill_to_data)
-        bill_to_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F9FAFB')),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-            ('PADDING', (0, 0), (-1, -1), 10),
-        ]))
+        bill_to_table.setStyle(_BILL_TO_TABLE_STYLE)
         story.append(bill_to_table)
     
     story.append(Spacer(1, 20))
     
     # Invoice Items
-    items_header_style = ParagraphStyle(
-        'ItemsHeader',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.white,
-        alignment=TA_CENTER
-    )
-    
     items_data = [
         [
-            Paragraph("<b>Description</b>", items_header_style),
-            Paragraph("<b>Student #</b>", items_header_style),
-            Paragraph("<b>Course</b>", items_header_style),
-            Paragraph("<b>Amount</b>", items_header_style)
+            Paragraph("<b>Description</b>", _ITEMS_HEADER_STYLE),
+            Paragraph("<b>Student #</b>", _ITEMS_HEADER_STYLE),
+            Paragraph("<b>Course</b>", _ITEMS_HEADER_STYLE),
+            Paragraph("<b>Amount</b>", _ITEMS_HEADER_STYLE)
         ]
     ]
     
     # Add payment item
-    if payment.student:
-        course_name = payment.student.course.name if payment.student.course else "Driving Course"
+    if student:
+        course_name = student.course.name if student.course else "Driving Course"
         items_data.append([
-            Paragraph(f"Payment for {course_name}", ParagraphStyle('Item', parent=styles['Normal'], fontSize=9)),
-            Paragraph(payment.student.student_number, ParagraphStyle('Item', parent=styles['Normal'], fontSize=9)),
-            Paragraph(course_name, ParagraphStyle('Item', parent=styles['Normal'], fontSize=9)),
-            Paragraph(format_currency(payment.amount), ParagraphStyle('Item', parent=styles['Normal'], fontSize=9, alignment=TA_RIGHT))
+            Paragraph(_row(f"Payment for {course_name}"), _ITEM_STYLE),
+            Paragraph(escape(student.student_number), _ITEM_STYLE),
+            Paragraph(escape(course_name), _ITEM_STYLE),
+            Paragraph(format_currency(payment.amount), _ITEM_RIGHT_STYLE)
         ])
     
-    items_table = Table(items_data, colWidths=[7*cm, 3*cm, 4*cm, 2*cm])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#DC2626')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
+    items_table = Table(items_data, colWidths=_ITEMS_COL_WIDTHS)
+    items_table.setStyle(_ITEMS_TABLE_STYLE)
     story.append(items_table)
     
     story.append(Spacer(1, 20))
@@ -551,28 +797,13 @@ def generate_invoice_pdf(payment):
         ["<b>Total Paid:</b>", f"<b>{format_currency(payment.amount)}</b>"]
     ]
     
-    totals_table = Table(totals_data, colWidths=[14*cm, 2*cm])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    totals_table = _kv_table(totals_data, _TOTALS_TABLE_STYLE, _COL_14_2)
     story.append(totals_table)
     
     # Payment Details
     story.append(Spacer(1, 20))
     
-    payment_details_style = ParagraphStyle(
-        'PaymentDetails',
-        parent=styles['Heading3'],
-        fontSize=10,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=5
-    )
-    
-    story.append(Paragraph("PAYMENT DETAILS", payment_details_style))
+    story.append(_plain_line("PAYMENT DETAILS", _INVOICE_SECTION_STYLE))
     
     payment_details_data = [
         ["Payment Method:", payment.payment_method.title()],
@@ -582,137 +813,120 @@ def generate_invoice_pdf(payment):
         ["Notes:", payment.notes or 'N/A']
     ]
     
-    payment_details_table = Table(payment_details_data, colWidths=[4*cm, 12*cm])
-    payment_details_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
+    payment_details_table = _kv_table(payment_details_data, _PAYMENT_DETAILS_TABLE_STYLE, _COL_4_12)
     story.append(payment_details_table)
     
     # Student Balance (if applicable)
-    if payment.student:
+    if student:
         story.append(Spacer(1, 20))
         
-        balance_style = ParagraphStyle(
-            'Balance',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#6B7280')
-        )
-        
         balance = Paragraph(
-            f"<b>Student Balance:</b> {format_currency(payment.student.balance)} "
-            f"(Total Fee: {format_currency(payment.student.total_fee)} - "
-            f"Paid: {format_currency(payment.student.amount_paid)})",
-            balance_style
+            f"<b>Student Balance:</b> {format_currency(student.balance)} "
+            f"(Total Fee: {format_currency(student.total_fee)} - "
+            f"Paid: {format_currency(student.amount_paid)})",
+            _BALANCE_STYLE
         )
         story.append(balance)
     
     # Footer
     story.append(Spacer(1, 30))
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_CENTER
-    )
-    
-    footer = Paragraph(
-        "Thank you for your payment!<br/>"
-        "This invoice is computer generated and does not require a signature.<br/>"
-        "For any inquiries, please contact info@keemdrivingschool.com or call +260 123 456 789",
-        footer_style
-    )
+    footer = Paragraph(_INVOICE_FOOTER_HTML, _FOOTER_STYLE)
     story.append(footer)
     
     # Build PDF
     doc.build(story)
-    return filename
+    return buffer.getvalue() if output is None else output
 
-def generate_student_report(student):
-    """
-    Generate comprehensive student report PDF
+def generate_invoice_pdf_to_file(payment):
     """
-    os.makedirs('exports/pdf/student_reports', exist_ok=True)
+    Save the invoice under exports/pdf/invoices and return its path
     
-    filename = f"exports/pdf/student_reports/student_{student.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    The invoice is reused until the payment or the student's balance changes.
+    """
+    student = payment.student
+    key = _cache_key(payment.id, payment.updated_at, student.updated_at if student else None)
+    filename = f"exports/pdf/invoices/invoice_{payment.id}_{key}.pdf"
+    return _build_cached(filename, lambda path: generate_invoice_pdf(payment, path))
+
+def _student_report_html(student, output=None):
+    """
+    Render the student report through WeasyPrint with the cached stylesheet
+    """
+    lessons = student.lessons
+    html = _PDF_TEMPLATES.get_template('student_report.html').render(
+        student=student,
+        applicant=student.application,
+        course=student.course,
+        branch=student.branch,
+        instructor=student.instructor,
+        now=datetime.now(),
+        completed_lessons=sum(lesson.status == 'completed' for lesson in lessons),
+        recent_lessons=heapq.nlargest(5, lessons, key=lambda x: x.scheduled_date),
+    )
+    pdf = HTML(string=html, base_url=_PDF_TEMPLATE_DIR).write_pdf(
+        output, stylesheets=[_STUDENT_REPORT_CSS]
+    )
+    return pdf if output is None else output
+
+def generate_student_report(student, output=None):
+    """
+    Generate comprehensive student report PDF
     
-    doc = SimpleDocTemplate(filename, pagesize=A4,
+    output works as in generate_application_pdf. Rendered from
+    templates/pdf/student_report.html when WeasyPrint is installed.
+    """
+    if HTML is not None:
+        try:
+            return _student_report_html(student, output)
+        except Exception as e:
+            print(f"Error rendering student report with WeasyPrint, using ReportLab: {str(e)}")
+    
+    applicant = student.application
+    course = student.course
+    branch = student.branch
+    instructor = student.instructor
+    now = datetime.now()
+    buffer = io.BytesIO() if output is None else output
+    
+    doc = SimpleDocTemplate(buffer, pagesize=A4,
                           topMargin=1.5*cm, bottomMargin=1.5*cm,
                           leftMargin=2*cm, rightMargin=2*cm)
     
     story = []
-    styles = getSampleStyleSheet()
     
     # Title
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=14,
-        textColor=colors.HexColor('#DC2626'),
-        spaceAfter=10,
-        alignment=TA_CENTER
-    )
-    
-    title = Paragraph("STUDENT PROGRESS REPORT", title_style)
+    title = Paragraph("STUDENT PROGRESS REPORT", _REPORT_TITLE_STYLE)
     story.append(title)
     
     # Student Information
-    info_style = ParagraphStyle(
-        'Info',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    
     info = Paragraph(
-        f"<b>Student Number:</b> {student.student_number} | "
-        f"<b>Report Date:</b> {datetime.now().strftime('%B %d, %Y')}",
-        info_style
+        f"<b>Student Number:</b> {escape(student.student_number)} | "
+        f"<b>Report Date:</b> {now.strftime('%B %d, %Y')}",
+        _REPORT_INFO_STYLE
     )
     story.append(info)
     
     # Student Details
-    if student.application:
+    if applicant:
         details_data = [
-            ["Student Name:", f"{student.application.first_name} {student.application.last_name}"],
-            ["Course:", student.course.name if student.course else 'N/A'],
+            ["Student Name:", f"{applicant.first_name} {applicant.last_name}"],
+            ["Course:", course.name if course else 'N/A'],
             ["Enrollment Date:", student.enrollment_date.strftime('%B %d, %Y')],
-            ["Course Duration:", f"{student.course.duration_weeks} weeks" if student.course else 'N/A'],
-            ["Instructor:", student.instructor.name if student.instructor else 'Not assigned'],
-            ["Branch:", student.branch.name if student.branch else 'N/A'],
+            ["Course Duration:", f"{course.duration_weeks} weeks" if course else 'N/A'],
+            ["Instructor:", instructor.name if instructor else 'Not assigned'],
+            ["Branch:", branch.name if branch else 'N/A'],
             ["Status:", student.status.title()],
             ["Progress:", f"{student.progress_percentage}%"]
         ]
         
-        details_table = Table(details_data, colWidths=[5*cm, 11*cm])
-        details_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F3F4F6')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        details_table = _kv_table(details_data, _STUDENT_DETAILS_TABLE_STYLE, _COL_5_11)
         story.append(details_table)
     
     story.append(Spacer(1, 20))
     
     # Progress Summary
-    progress_header_style = ParagraphStyle(
-        'ProgressHeader',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#1F2937'),
-        spaceAfter=10
-    )
-    
-    story.append(Paragraph("Progress Summary", progress_header_style))
+    story.append(_plain_line("Progress Summary", _REPORT_SECTION_STYLE))
     
     # Create a progress bar visualization
     progress_width = 400
@@ -721,24 +935,22 @@ def generate_student_report(student):
     # Note: For actual progress bar graphics, we'd need to use ReportLab's drawing capabilities
     # For now, we'll show a textual representation
     
+    lessons = student.lessons
+    completed_lessons = sum(lesson.status == 'completed' for lesson in lessons)
+    
     progress_data = [
         ["Overall Progress:", f"{student.progress_percentage}%"],
         ["Last Assessment Score:", f"{student.last_assessment_score or 'N/A'}/100"],
-        ["Lessons Completed:", f"{len([l for l in student.lessons if l.status == 'completed'])}"],
+        ["Lessons Completed:", f"{completed_lessons}"],
         ["Attendance Rate:", "Calculating..."]
     ]
     
-    progress_table = Table(progress_data, colWidths=[6*cm, 10*cm])
-    progress_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    progress_table = _kv_table(progress_data, _REPORT_TABLE_STYLE, _COL_6_10)
     story.append(progress_table)
     
     # Financial Summary
     story.append(Spacer(1, 20))
-    story.append(Paragraph("Financial Summary", progress_header_style))
+    story.append(_plain_line("Financial Summary", _REPORT_SECTION_STYLE))
     
     financial_data = [
         ["Total Course Fee:", format_currency(student.total_fee)],
@@ -747,24 +959,20 @@ def generate_student_report(student):
         ["Payment Status:", student.payment_status.title()]
     ]
     
-    financial_table = Table(financial_data, colWidths=[6*cm, 10*cm])
-    financial_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('BACKGROUND', (2, 2), (2, 2), colors.HexColor('#FEF2F2') if student.balance > 0 else colors.HexColor('#F0FDF4')),
-    ]))
+    financial_style = _BALANCE_DUE_TABLE_STYLE if student.balance > 0 else _BALANCE_CLEAR_TABLE_STYLE
+    financial_table = _kv_table(financial_data, financial_style, _COL_6_10)
     story.append(financial_table)
     
     # Recent Lessons (if any)
-    if student.lessons:
+    if lessons:
         story.append(Spacer(1, 20))
-        story.append(Paragraph("Recent Lessons", progress_header_style))
+        story.append(_plain_line("Recent Lessons", _REPORT_SECTION_STYLE))
         
         lessons_header = ["Date", "Type", "Status", "Score", "Instructor"]
         lessons_data = [lessons_header]
         
-        for lesson in sorted(student.lessons, key=lambda x: x.scheduled_date, reverse=True)[:5]:
+        # Only the five most recent are shown, so avoid sorting the whole list
+        for lesson in heapq.nlargest(5, lessons, key=lambda x: x.scheduled_date):
             lessons_data.append([
                 lesson.scheduled_date.strftime('%Y-%m-%d'),
                 lesson.lesson_type.title(),
@@ -773,36 +981,123 @@ def generate_student_report(student):
                 lesson.instructor.name if lesson.instructor else "N/A"
             ])
         
-        lessons_table = Table(lessons_data, colWidths=[3*cm, 3*cm, 3*cm, 2*cm, 5*cm])
-        lessons_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#DC2626')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E5E7EB')),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ]))
+        lessons_table = Table(lessons_data, colWidths=_LESSONS_COL_WIDTHS)
+        lessons_table.setStyle(_LESSONS_TABLE_STYLE)
         story.append(lessons_table)
     
     # Footer
     story.append(Spacer(1, 30))
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#6B7280'),
-        alignment=TA_CENTER
-    )
-    
     footer = Paragraph(
-        f"Report generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')} | "
-        f"KEEM Driving School - {student.branch.name if student.branch else 'Main Branch'}",
-        footer_style
+        f"Report generated on {now.strftime('%B %d, %Y at %I:%M %p')} | "
+        f"KEEM Driving School - {escape(branch.name) if branch else 'Main Branch'}",
+        _FOOTER_STYLE
     )
     story.append(footer)
     
     # Build PDF
     doc.build(story)
-    return filename
\ No newline at end of file
+    return buffer.getvalue() if output is None else output
+
+def generate_student_report_to_file(student):
+    """
+    Save the student report under exports/pdf/student_reports and return its path
+    """
+    filename = f"exports/pdf/student_reports/student_{student.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return generate_student_report(student, filename)
+
+# Task kind -> (model name in app.py, generator)
+_BULK_GENERATORS = {
+    'application': ('Application', generate_application_pdf_to_file),
+    'acceptance': ('Application', generate_acceptance_letter_to_file),
+    'invoice': ('Payment', generate_invoice_pdf_to_file),
+    'student': ('Student', generate_student_report_to_file),
+}
+
+def _eager_options(models, kind):
+    """
+    Loader options for everything the generator for kind reads, so rendering
+    runs off one query instead of a lazy SELECT per relationship
+    """
+    from sqlalchemy.orm import joinedload, selectinload
+    
+    if kind in ('application', 'acceptance'):
+        return (
+            joinedload(models.Application.course),
+            joinedload(models.Application.branch),
+        )
+    if kind == 'invoice':
+        student = joinedload(models.Payment.student)
+        return (
+            student.joinedload(models.Student.application),
+            student.joinedload(models.Student.course),
+            joinedload(models.Payment.receiver),
+        )
+    return (
+        joinedload(models.Student.application),
+        joinedload(models.Student.course),
+        joinedload(models.Student.instructor),
+        joinedload(models.Student.branch),
+        selectinload(models.Student.lessons).joinedload(models.Lesson.instructor),
+    )
+
+# The app module (e.g. 'app' or 'keem.app11') a bulk worker process renders against
+_BULK_APP = None
+
+def _init_bulk_worker(app_module):
+    """
+    ProcessPoolExecutor initializer: import the app module once per worker
+    
+    Forked workers inherit the parent's SQLAlchemy connection pool, which
+    must not be shared across processes, so it is disposed and each worker
+    opens its own connections.
+    """
+    global _BULK_APP
+    _BULK_APP = importlib.import_module(app_module)
+    with _BULK_APP.app.app_context():
+        _BULK_APP.db.engine.dispose()
+
+def _generate_from_task(task):
+    """
+    Worker for generate_pdfs_bulk: re-fetch the object by id and render it
+    
+    ORM instances are not pickled across processes, so each worker loads
+    its own copy inside an app context.
+    """
+    kind, obj_id = task
+    result = {'kind': kind, 'id': obj_id, 'path': None, 'error': None}
+    try:
+        model_name, generator = _BULK_GENERATORS[kind]
+        with _BULK_APP.app.app_context():
+            model = getattr(_BULK_APP, model_name)
+            obj = model.query.options(*_eager_options(_BULK_APP, kind)).filter_by(id=obj_id).first()
+            if obj is None:
+                result['error'] = f"{kind} {obj_id} not found"
+            else:
+                result['path'] = generator(obj)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def generate_pdfs_bulk(tasks, app_module='app', max_workers=None):
+    """
+    Render many PDFs in parallel across CPU cores
+    
+    Args:
+        tasks: Iterable of (kind, id) tuples where kind is one of
+               'application', 'acceptance', 'invoice' or 'student'
+        app_module: Import path of the Flask app module whose models and
+                    database the workers use ('keem.app11' under Passenger)
+        max_workers: Number of worker processes (defaults to os.cpu_count())
+    
+    Returns one dict per task, in task order, with 'kind', 'id', 'path'
+    (the generated file, or None) and 'error' (None on success). If the
+    app module can't be imported the pool breaks and the error is raised.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=_init_bulk_worker, initargs=(app_module,)) as executor:
+        return list(executor.map(_generate_from_task, tasks))